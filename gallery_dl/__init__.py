@@ -31,6 +31,178 @@ def progress(urls, pformat):
         yield pinfo["url"]
 
 
+def run_archive_tool(args):
+    """Run download archive maintenance operations"""
+    log = logging.getLogger("archive")
+
+    try:
+        if args.archive_stats:
+            prefixes = set()
+            for extr in extractor.extractors():
+                prefixes.add(extr.category)
+                for category, _ in getattr(extr, "instances", ()):
+                    prefixes.add(category)
+            write = sys.stdout.write
+            for prefix, count in util.archive_stats(
+                    util.expand_path(args.archive_stats), prefixes):
+                write("{:<20} {:>10}\n".format(prefix or "(other)", count))
+
+        elif args.archive_export:
+            cnt = util.archive_export(
+                util.expand_path(args.archive_export), sys.stdout)
+            log.debug("Exported %d entries", cnt)
+
+        elif args.archive_import:
+            cnt = util.archive_import(
+                util.expand_path(args.archive_import), sys.stdin)
+            log.info("Added %d new entries", cnt)
+
+        elif args.archive_merge:
+            if len(args.archive_merge) < 2:
+                log.error("'--archive-merge' requires at least two files")
+                return 2
+            path, *sources = map(util.expand_path, args.archive_merge)
+            cnt = util.archive_merge(path, sources)
+            log.info("Added %d new entries to '%s'", cnt, path)
+
+        else:
+            path = util.expand_path(args.archive_vacuum)
+            before, after = util.archive_vacuum(path)
+            log.info("Rebuilt '%s' (%s -> %s bytes)",
+                     path, before, after)
+
+    except Exception as exc:
+        log.error("%s: %s", exc.__class__.__name__, exc)
+        return 1
+    return 0
+
+
+def run_job(jobtype, url, log):
+    """Run a single job for 'url' and return its exit status"""
+    while True:
+        try:
+            log.debug("Starting %s for '%s'", jobtype.__name__, url)
+            if isinstance(url, util.ExtendedUrl):
+                with config.apply(url.lconfig):
+                    return jobtype(url.value).run()
+            return jobtype(url).run()
+        except exception.TerminateExtraction:
+            return 0
+        except exception.RestartExtraction:
+            log.debug("Restarting '%s'", url)
+        except exception.NoExtractorError:
+            log.error("Unsupported URL '%s'", url)
+            return 64
+
+
+def run_serial(jobtype, urls, log):
+    """Run jobs for 'urls' one after another"""
+    retval = 0
+    for url in urls:
+        if isinstance(url, util.ExtendedUrl):
+            for opts in url.gconfig:
+                config.set(*opts)
+        retval |= run_job(jobtype, url, log)
+    return retval
+
+
+def run_parallel(jobtype, urls, log, workers, per_category=1):
+    """Run jobs for 'urls' in up to 'workers' parallel processes
+
+    Each job runs in its own forked process with its own copy of the
+    current configuration, so local input file options of one URL
+    do not affect any other job.
+    At most 'per_category' jobs for the same extractor category
+    are running at the same time.
+    """
+    import multiprocessing
+    from multiprocessing.connection import wait
+
+    if "fork" not in multiprocessing.get_all_start_methods():
+        log.warning("Parallel jobs are not supported on this platform")
+        return run_serial(jobtype, urls, log)
+
+    context = multiprocessing.get_context("fork")
+    running = {}   # process sentinel -> (process, url, category)
+    active = {}    # category -> number of running jobs
+    waiting = []   # (url, category) pairs blocked by 'per_category'
+    retval = 0
+
+    def start(url, category):
+        process = context.Process(
+            target=_run_job_process, args=(jobtype, url, log))
+        process.start()
+        running[process.sentinel] = (process, url, category)
+        active[category] = active.get(category, 0) + 1
+
+    urls = iter(urls)
+    barrier = None
+    while True:
+        while len(running) < workers:
+            # start the first waiting job whose category has a free slot
+            for index, (url, category) in enumerate(waiting):
+                if active.get(category, 0) < per_category:
+                    del waiting[index]
+                    start(url, category)
+                    break
+            else:
+                if barrier is not None:
+                    if waiting:
+                        break
+                    url = barrier
+                    barrier = None
+                else:
+                    url = next(urls, None)
+                    if url is None:
+                        break
+
+                if isinstance(url, util.ExtendedUrl):
+                    if url.gconfig and waiting:
+                        # global options must not affect earlier URLs
+                        barrier = url
+                        break
+                    for opts in url.gconfig:
+                        config.set(*opts)
+                    extr = extractor.find(url.value)
+                else:
+                    extr = extractor.find(url)
+                if not extr:
+                    log.error("Unsupported URL '%s'", url)
+                    retval |= 64
+                    continue
+
+                category = extr.category
+                if active.get(category, 0) < per_category:
+                    start(url, category)
+                else:
+                    waiting.append((url, category))
+
+        if not running:
+            return retval
+
+        for sentinel in wait(list(running)):
+            process, url, category = running.pop(sentinel)
+            process.join()
+            active[category] -= 1
+
+            status = process.exitcode
+            if status < 0:
+                status = 1  # killed by a signal
+            log.debug("Finished %s for '%s' (%s)",
+                      jobtype.__name__, url, status)
+            retval |= status
+
+
+def _run_job_process(jobtype, url, log):
+    # do not reuse a database connection across fork()
+    from . import cache
+    if cache.DatabaseCacheDecorator.backend and not cache._init():
+        # already decorated functions would keep using the parent's one
+        log.error("Failed to reopen cache database for '%s'", url)
+        sys.exit(1)
+    sys.exit(run_job(jobtype, url, log))
+
+
 def main():
     try:
         parser = option.build_parser()
@@ -78,6 +250,10 @@ def main():
                 profile, _, container = profile.partition("::")
             config.set((), "cookies", (
                 browser, profile, keyring, container, domain))
+        if args.json_lines:
+            config.set(("output",), "json-lines", True)
+            if not args.jobtype:
+                args.jobtype = job.DataJob
         if args.options_pp:
             config.set((), "postprocessor-options", args.options_pp)
         for opts in args.options:
@@ -119,6 +295,21 @@ def main():
             from . import formatter
             formatter._SEPARATOR = separator
 
+        # compiled format strings
+        if config.get((), "format-compile"):
+            from . import formatter
+            formatter._COMPILE = True
+
+        # JSON encoder
+        encoder = config.get((), "json-encoder")
+        if encoder:
+            util.JSON_ENCODER = encoder
+
+        # in-memory cache size
+        size = config.get(("cache",), "memory-size")
+        if size is not None:
+            util.LRUCache.maxsize = size
+
         # eval globals
         path = config.get((), "globals")
         if path:
@@ -217,12 +408,32 @@ def main():
             else:
                 log.info(
                     "Deleted %d %s from '%s'",
-                    cnt, "entry" if cnt == 1 else "entries", cache._path(),
+                    cnt, "entry" if cnt == 1 else "entries",
+                    cache.DatabaseCacheDecorator.backend.path,
                 )
 
+        elif args.cache_info:
+            from . import cache
+            info = cache.info()
+
+            if info is None:
+                logging.getLogger("cache").error(
+                    "Database file not available")
+            else:
+                sys.stdout.write(
+                    "Path   : {path}\n"
+                    "Size   : {size} bytes\n"
+                    "Entries: {entries} ({expired} expired)\n".format_map(
+                        info))
+
         elif args.config_init:
             return config.initialize()
 
+        elif args.archive_stats or args.archive_export or \
+                args.archive_import or args.archive_merge or \
+                args.archive_vacuum:
+            return run_archive_tool(args)
+
         else:
             if not args.urls and not args.inputfiles:
                 parser.error(
@@ -269,31 +480,15 @@ def main():
             else:
                 urls = iter(urls)
 
-            retval = 0
-            url = next(urls, None)
-
-            while url is not None:
-                try:
-                    log.debug("Starting %s for '%s'", jobtype.__name__, url)
-                    if isinstance(url, util.ExtendedUrl):
-                        for opts in url.gconfig:
-                            config.set(*opts)
-                        with config.apply(url.lconfig):
-                            retval |= jobtype(url.value).run()
-                    else:
-                        retval |= jobtype(url).run()
-                except exception.TerminateExtraction:
-                    pass
-                except exception.RestartExtraction:
-                    log.debug("Restarting '%s'", url)
-                    continue
-                except exception.NoExtractorError:
-                    log.error("Unsupported URL '%s'", url)
-                    retval |= 64
-
-                url = next(urls, None)
-
-            return retval
+            workers = config.get((), "jobs-concurrent", 1)
+            try:
+                if workers > 1 and issubclass(jobtype, job.DownloadJob):
+                    return run_parallel(
+                        jobtype, urls, log, workers,
+                        config.get((), "jobs-concurrent-category", 1))
+                return run_serial(jobtype, urls, log)
+            finally:
+                util.log_cache_stats(log)
 
     except KeyboardInterrupt:
         raise SystemExit("\nKeyboardInterrupt")
@@ -8,19 +8,31 @@
 
 """Decorators to keep function results in an in-memory and database cache"""
 
+import contextlib
+import threading
+import hashlib
 import sqlite3
 import pickle
+import hmac
+import socket
 import time
 import os
+import re
+import logging
 import functools
+import urllib.parse
 from . import config, util
 
+EXPIRE_INTERVAL = 3600
+EXPIRE_TIMEOUT = 100  # milliseconds
+log = logging.getLogger("cache")
+
 
 class CacheDecorator():
     """Simplified in-memory cache"""
     def __init__(self, func, keyarg):
         self.func = func
-        self.cache = {}
+        self.cache = util.LRUCache(_name(func))
         self.keyarg = keyarg
 
     def __get__(self, instance, cls):
@@ -49,6 +61,7 @@ class MemoryCacheDecorator(CacheDecorator):
     def __init__(self, func, keyarg, maxage):
         CacheDecorator.__init__(self, func, keyarg)
         self.maxage = maxage
+        self.sweep = 0
 
     def __call__(self, *args, **kwargs):
         key = "" if self.keyarg is None else args[self.keyarg]
@@ -61,21 +74,28 @@ class MemoryCacheDecorator(CacheDecorator):
             value = self.func(*args, **kwargs)
             expires = timestamp + self.maxage
             self.cache[key] = value, expires
+            if self.sweep <= timestamp:
+                self._sweep(timestamp)
         return value
 
     def update(self, key, value):
         self.cache[key] = value, int(time.time()) + self.maxage
 
+    def _sweep(self, timestamp):
+        """Drop all expired entries"""
+        self.sweep = timestamp + self.maxage
+        self.cache.expire(lambda entry: entry[1] <= timestamp)
+
 
 class DatabaseCacheDecorator():
     """Database cache"""
-    db = None
-    _init = True
+    backend = None
+    _expire = 0
 
     def __init__(self, func, keyarg, maxage):
         self.key = "%s.%s" % (func.__module__, func.__name__)
         self.func = func
-        self.cache = {}
+        self.cache = util.LRUCache(self.key)
         self.keyarg = keyarg
         self.maxage = maxage
 
@@ -96,51 +116,60 @@ class DatabaseCacheDecorator():
 
         # database lookup
         fullkey = "%s-%s" % (self.key, key)
-        with self.database() as db:
-            cursor = db.cursor()
-            try:
-                cursor.execute("BEGIN EXCLUSIVE")
-            except sqlite3.OperationalError:
-                pass  # Silently swallow exception - workaround for Python 3.6
-            cursor.execute(
-                "SELECT value, expires FROM data WHERE key=? LIMIT 1",
-                (fullkey,),
-            )
-            result = cursor.fetchone()
+        backend = self.database()
+        result = backend.get(fullkey, timestamp)
 
-            if result and result[1] > timestamp:
-                value, expires = result
-                value = pickle.loads(value)
-            else:
-                value = self.func(*args, **kwargs)
-                expires = timestamp + self.maxage
-                cursor.execute(
-                    "INSERT OR REPLACE INTO data VALUES (?,?,?)",
-                    (fullkey, pickle.dumps(value), expires),
-                )
+        if result:
+            value, expires = result
+        else:
+            with backend.lock(fullkey):
+                # another process might have stored a value in the meantime
+                result = backend.get(fullkey, timestamp)
+                if result:
+                    value, expires = result
+                else:
+                    value = self.func(*args, **kwargs)
+                    expires = timestamp + self.maxage
+                    backend.set(fullkey, value, expires)
 
         self.cache[key] = value, expires
+        if self._expire <= timestamp:
+            expire()
         return value
 
     def update(self, key, value):
         expires = int(time.time()) + self.maxage
         self.cache[key] = value, expires
-        with self.database() as db:
-            db.execute(
-                "INSERT OR REPLACE INTO data VALUES (?,?,?)",
-                ("%s-%s" % (self.key, key), pickle.dumps(value), expires),
-            )
+        self.database().set("%s-%s" % (self.key, key), value, expires)
 
     def invalidate(self, key):
         try:
             del self.cache[key]
         except KeyError:
             pass
-        with self.database() as db:
-            db.execute(
-                "DELETE FROM data WHERE key=?",
-                ("%s-%s" % (self.key, key),),
-            )
+        self.database().delete("%s-%s" % (self.key, key))
+
+    def database(self):
+        return self.backend
+
+
+class SQLiteBackend():
+    """Cache entries stored in a local SQLite3 database file"""
+
+    def __init__(self, path, wal=True):
+        self.path = path
+
+        # restrict access permissions for new db files
+        os.close(os.open(path, os.O_CREAT | os.O_RDONLY, 0o600))
+
+        db = self.db = sqlite3.connect(
+            path, timeout=60, check_same_thread=False)
+
+        # allow reads while another process holds a write lock
+        if wal:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.execute("PRAGMA synchronous=NORMAL")
+        self._init = True
 
     def database(self):
         if self._init:
@@ -148,9 +177,280 @@ class DatabaseCacheDecorator():
                 "CREATE TABLE IF NOT EXISTS data "
                 "(key TEXT PRIMARY KEY, value TEXT, expires INTEGER)"
             )
-            DatabaseCacheDecorator._init = False
+            self._init = False
         return self.db
 
+    def get(self, key, timestamp):
+        result = self.database().execute(
+            "SELECT value, expires FROM data WHERE key=? LIMIT 1",
+            (key,),
+        ).fetchone()
+        if result and result[1] > timestamp:
+            return pickle.loads(result[0]), result[1]
+        return None
+
+    def set(self, key, value, expires):
+        with self.database() as db:
+            db.execute(
+                "INSERT OR REPLACE INTO data VALUES (?,?,?)",
+                (key, pickle.dumps(value), expires),
+            )
+
+    def delete(self, key):
+        with self.database() as db:
+            db.execute("DELETE FROM data WHERE key=?", (key,))
+
+    @contextlib.contextmanager
+    def lock(self, key):
+        """Do nothing
+
+        Holding a write lock while computing a new value, e.g. during
+        a login, would block all other processes writing to this file.
+        """
+        yield
+
+    def clear(self, prefix):
+        cursor = self.db.cursor()
+        try:
+            if prefix is None:
+                cursor.execute("DELETE FROM data")
+            else:
+                cursor.execute(
+                    "DELETE FROM data WHERE key LIKE ? || '%'", (prefix,))
+        except sqlite3.OperationalError:
+            return 0  # database not initialized, cannot be modified, etc.
+
+        rowcount = cursor.rowcount
+        self.db.commit()
+        if rowcount:
+            cursor.execute("VACUUM")
+        return rowcount
+
+    def expire(self, timestamp):
+        db = self.db
+        try:
+            # give up quickly when another process is writing
+            db.execute("PRAGMA busy_timeout = {}".format(EXPIRE_TIMEOUT))
+            with db:
+                return db.execute(
+                    "DELETE FROM data WHERE expires <= ?", (timestamp,),
+                ).rowcount
+        except sqlite3.OperationalError:
+            return 0  # database locked, not initialized, etc.
+        finally:
+            db.execute("PRAGMA busy_timeout = 60000")
+
+    def info(self, timestamp):
+        size = 0
+        for suffix in ("", "-wal"):
+            try:
+                size += os.stat(self.path + suffix).st_size
+            except OSError:
+                pass
+
+        try:
+            entries, expired = self.db.execute(
+                "SELECT COUNT(*), COUNT(CASE WHEN expires <= ? THEN 1 END) "
+                "FROM data", (timestamp,),
+            ).fetchone()
+        except sqlite3.OperationalError:
+            entries = expired = 0
+
+        return {
+            "path"   : self.path,
+            "size"   : size,
+            "entries": entries,
+            "expired": expired,
+        }
+
+
+class RedisBackend():
+    """Cache entries stored on a Redis-compatible key-value server
+
+    Entries expire on the server itself. While one process computes
+    a new value, others wait for it instead of computing it as well.
+
+    Values are signed with an HMAC keyed by 'secret' or the server password
+    and only get unpickled when their signature is valid.
+    """
+    namespace = "gallery-dl:"
+    lock_timeout = 60
+
+    def __init__(self, url, secret=None, timeout=10):
+        url = urllib.parse.urlsplit(url)
+        self.address = (url.hostname or "localhost", url.port or 6379)
+        self.username = urllib.parse.unquote(url.username or "")
+        self.password = urllib.parse.unquote(url.password or "")
+        secret = secret or self.password
+        if not secret:
+            raise ValueError("no 'secret' to sign cache values with")
+        self.secret = secret.encode()
+        self.dbindex = url.path.strip("/")
+        self.path = "redis://{}:{}/{}".format(
+            self.address[0], self.address[1], self.dbindex or "0")
+        self.timeout = timeout
+        self.socket = self.rfile = None
+        self.mutex = threading.Lock()
+        self.retry = 0
+
+    def command(self, *args):
+        """Send a command and return its reply
+
+        Returns None when the server is not available
+        """
+        with self.mutex:
+            if self.socket is None:
+                if self.retry > time.time():
+                    return None
+                try:
+                    self._connect()
+                except OSError as exc:
+                    return self._error(exc)
+            try:
+                self._send(args)
+                return self._reply()
+            except OSError as exc:
+                return self._error(exc)
+
+    def close(self):
+        if self.socket is not None:
+            self.rfile.close()
+            self.socket.close()
+            self.socket = self.rfile = None
+
+    def _error(self, exc):
+        log.warning("Cache server %s unavailable (%s: %s)",
+                    self.path, exc.__class__.__name__, exc)
+        self.close()
+        self.retry = time.time() + self.lock_timeout
+
+    def get(self, key, timestamp):
+        key = self.namespace + key
+        data = self.command("GET", key)
+        if data:
+            signature, data = data[:32], data[32:]
+            if not hmac.compare_digest(signature, self._sign(key, data)):
+                log.warning("Ignoring cache entry '%s' with invalid "
+                            "signature", key)
+                return None
+            value, expires = pickle.loads(data)
+            if expires > timestamp:
+                return value, expires
+        return None
+
+    def set(self, key, value, expires):
+        key = self.namespace + key
+        data = pickle.dumps((value, expires))
+        self.command(
+            "SET", key, self._sign(key, data) + data,
+            "EX", max(expires - int(time.time()), 1))
+
+    def _sign(self, key, data):
+        """Return a SHA-256 HMAC of 'key' and 'data'"""
+        return hmac.new(
+            self.secret, key.encode() + b"\0" + data, hashlib.sha256).digest()
+
+    def delete(self, key):
+        self.command("DEL", self.namespace + key)
+
+    @contextlib.contextmanager
+    def lock(self, key):
+        """Hold a lock for 'key' shared by all clients of this server"""
+        lockkey = self.namespace + "lock:" + key
+        token = util.generate_token()
+        deadline = time.time() + self.lock_timeout
+
+        while self.command(
+                "SET", lockkey, token, "NX", "EX", self.lock_timeout) is None:
+            if self.socket is None or time.time() > deadline:
+                break
+            time.sleep(0.2)
+        try:
+            yield
+        finally:
+            if self.command("GET", lockkey) == token.encode():
+                self.command("DEL", lockkey)
+
+    def clear(self, prefix):
+        keys = self._keys(self.namespace + (prefix or ""))
+        if keys:
+            return self.command("DEL", *keys) or 0
+        return 0
+
+    def expire(self, timestamp):
+        return 0
+
+    def info(self, timestamp):
+        keys = self._keys(self.namespace)
+        return {
+            "path"   : self.path,
+            "size"   : sum(self.command("STRLEN", key) or 0 for key in keys),
+            "entries": len(keys),
+            "expired": 0,
+        }
+
+    def _keys(self, prefix):
+        pattern = re.sub(r"([*?\[\]\\])", r"\\\1", prefix) + "*"
+        keys = []
+        cursor = b"0"
+        while True:
+            reply = self.command(
+                "SCAN", cursor, "MATCH", pattern, "COUNT", 1000)
+            if not reply:
+                return keys
+            cursor, batch = reply
+            keys.extend(batch)
+            if cursor == b"0":
+                return keys
+
+    def _connect(self):
+        self.socket = socket.create_connection(self.address, self.timeout)
+        self.rfile = self.socket.makefile("rb")
+        if self.password:
+            if self.username:
+                self._send(("AUTH", self.username, self.password))
+            else:
+                self._send(("AUTH", self.password))
+            self._reply()
+        if self.dbindex:
+            self._send(("SELECT", self.dbindex))
+            self._reply()
+
+    def _send(self, args):
+        data = ["*{}\r\n".format(len(args)).encode()]
+        for arg in args:
+            if not isinstance(arg, bytes):
+                arg = str(arg).encode()
+            data.append("${}\r\n".format(len(arg)).encode())
+            data.append(arg)
+            data.append(b"\r\n")
+        self.socket.sendall(b"".join(data))
+
+    def _reply(self):
+        line = self.rfile.readline()
+        if not line.endswith(b"\r\n"):
+            raise ConnectionError("Connection closed by server")
+        kind, line = line[:1], line[1:-2]
+
+        if kind == b"+":
+            return line
+        if kind == b":":
+            return int(line)
+        if kind == b"$":
+            length = int(line)
+            if length < 0:
+                return None
+            data = self.rfile.read(length + 2)
+            return data[:-2]
+        if kind == b"*":
+            length = int(line)
+            if length < 0:
+                return None
+            return [self._reply() for _ in range(length)]
+        if kind == b"-":
+            raise OSError(line.decode(errors="replace"))
+        raise ConnectionError("Invalid reply from cache server")
+
 
 def memcache(maxage=None, keyarg=None):
     if maxage:
@@ -170,59 +470,73 @@ def cache(maxage=3600, keyarg=None):
 
 def clear(module):
     """Delete database entries for 'module'"""
-    db = DatabaseCacheDecorator.db
-    if not db:
+    backend = DatabaseCacheDecorator.backend
+    if not backend:
         return None
 
-    rowcount = 0
-    cursor = db.cursor()
-
-    try:
-        if module == "ALL":
-            cursor.execute("DELETE FROM data")
-        else:
-            cursor.execute(
-                "DELETE FROM data "
-                "WHERE key LIKE 'gallery_dl.extractor.' || ? || '.%'",
-                (module.lower(),)
-            )
-    except sqlite3.OperationalError:
-        pass  # database not initialized, cannot be modified, etc.
+    if module == "ALL":
+        prefix = None
     else:
-        rowcount = cursor.rowcount
-        db.commit()
-        if rowcount:
-            cursor.execute("VACUUM")
-    return rowcount
+        prefix = "gallery_dl.extractor.{}.".format(module.lower())
+    return backend.clear(prefix)
+
+
+def expire():
+    """Delete expired database entries"""
+    backend = DatabaseCacheDecorator.backend
+    if not backend:
+        return None
+
+    timestamp = int(time.time())
+    DatabaseCacheDecorator._expire = timestamp + EXPIRE_INTERVAL
+    return backend.expire(timestamp)
+
+
+def info():
+    """Return location, size, and number of entries of the cache database"""
+    backend = DatabaseCacheDecorator.backend
+    if not backend:
+        return None
+    return backend.info(int(time.time()))
+
+
+def _name(func):
+    return "%s.%s" % (func.__module__, getattr(
+        func, "__qualname__", func.__name__))
 
 
 def _path():
     path = config.get(("cache",), "file", util.SENTINEL)
     if path is not util.SENTINEL:
         return util.expand_path(path)
+    return os.path.join(_directory(), "cache.sqlite3")
 
-    if util.WINDOWS:
-        cachedir = os.environ.get("APPDATA", "~")
-    else:
-        cachedir = os.environ.get("XDG_CACHE_HOME", "~/.cache")
 
-    cachedir = util.expand_path(os.path.join(cachedir, "gallery-dl"))
+def _directory():
+    cachedir = util.cache_directory()
     os.makedirs(cachedir, exist_ok=True)
-    return os.path.join(cachedir, "cache.sqlite3")
+    return cachedir
 
 
 def _init():
+    """Set up the database backend; Return False if that is not possible"""
+    global cache
+    backend = config.get(("cache",), "backend")
     try:
-        dbfile = _path()
-
-        # restrict access permissions for new db files
-        os.close(os.open(dbfile, os.O_CREAT | os.O_RDONLY, 0o600))
-
-        DatabaseCacheDecorator.db = sqlite3.connect(
-            dbfile, timeout=60, check_same_thread=False)
+        if backend and backend.startswith("redis://"):
+            DatabaseCacheDecorator.backend = RedisBackend(
+                backend, config.get(("cache",), "secret"))
+        else:
+            DatabaseCacheDecorator.backend = SQLiteBackend(
+                _path(), config.get(("cache",), "wal", True))
+    except ValueError as exc:
+        log.warning("Not using cache server %s (%s)", backend, exc)
+        cache = memcache
+        return False
     except (OSError, TypeError, sqlite3.OperationalError):
-        global cache
         cache = memcache
+        return False
+    return True
 
 
 _init()
@@ -21,6 +21,7 @@ log = logging.getLogger("config")
 
 _config = {}
 _files = []
+_views = {}
 
 if util.WINDOWS:
     _default_configs = [
@@ -112,6 +113,7 @@ def load(files=None, strict=False, loads=util.json_loads):
             else:
                 util.combine_dict(_config, conf)
             _files.append(pathfmt)
+            _views.clear()
 
             if "subconfigs" in conf:
                 subconfigs = conf["subconfigs"]
@@ -124,6 +126,7 @@ def load(files=None, strict=False, loads=util.json_loads):
 def clear():
     """Reset configuration to an empty state"""
     _config.clear()
+    _views.clear()
 
 
 def get(path, key, default=None, conf=_config):
@@ -182,6 +185,45 @@ def interpolate_common(common, paths, key, default=None, conf=_config):
     return default
 
 
+def view(path):
+    """Return a dict with all values 'interpolate()' would find for 'path'
+
+    The result is cached until the configuration gets modified
+    and must not be changed by the caller.
+    """
+    try:
+        return _views[path]
+    except KeyError:
+        pass
+
+    result = {}
+    _merge(_config, path, result)
+    result.update(_config)
+    _views[path] = result
+    return result
+
+
+def view_common(common, paths):
+    """Return a dict with all values 'interpolate_common()' would find"""
+    key = (common, paths)
+    try:
+        return _views[key]
+    except KeyError:
+        pass
+
+    result = {}
+    conf = _merge(_config, common, result)
+    if conf is not None:
+        # values from earlier paths take precedence
+        values = {}
+        for path in reversed(paths):
+            _merge(conf, path, values)
+        result.update(values)
+    result.update(_config)
+    _views[key] = result
+    return result
+
+
 def accumulate(path, key, conf=_config):
     """Accumulate the values of 'key' along 'path'"""
     result = []
@@ -209,6 +251,7 @@ def set(path, key, value, conf=_config):
         except KeyError:
             conf[p] = conf = {}
     conf[key] = value
+    _views.clear()
 
 
 def setdefault(path, key, value, conf=_config):
@@ -218,6 +261,7 @@ def setdefault(path, key, value, conf=_config):
             conf = conf[p]
         except KeyError:
             conf[p] = conf = {}
+    _views.clear()
     return conf.setdefault(key, value)
 
 
@@ -229,6 +273,23 @@ def unset(path, key, conf=_config):
         del conf[key]
     except Exception:
         pass
+    _views.clear()
+
+
+def _merge(conf, path, result):
+    """Collect the values of all dicts along 'path' into 'result'
+
+    Returns the last dict or None if 'path' does not exist
+    """
+    for p in path:
+        try:
+            conf = conf[p]
+        except Exception:
+            return None
+        if not isinstance(conf, dict):
+            return None
+        result.update(conf)
+    return conf
 
 
 class apply():
@@ -8,8 +8,11 @@
 
 """Downloader module for http:// and https:// URLs"""
 
+import os
+import json
 import time
 import mimetypes
+import threading
 from requests.exceptions import RequestException, ConnectionError, Timeout
 from .common import DownloaderBase
 from .. import text, util
@@ -43,6 +46,8 @@ class HttpDownloader(DownloaderBase):
         self.verify = self.config("verify", extractor._verify)
         self.mtime = self.config("mtime", True)
         self.rate = self.config("rate")
+        self.segments = self.config("segments", 1)
+        self.segments_min = self.config("segments-filesize-min", "50M")
 
         if not self.config("consume-content", False):
             # this resets the underlying TCP connection, and therefore
@@ -71,6 +76,16 @@ class HttpDownloader(DownloaderBase):
                     "Invalid chunk size (%r)", self.chunk_size)
                 chunk_size = 32768
             self.chunk_size = chunk_size
+        if self.segments > 1:
+            if isinstance(self.segments_min, str):
+                segments_min = text.parse_bytes(self.segments_min)
+                if not segments_min:
+                    self.log.warning("Invalid minimum segmented file size "
+                                     "(%r)", self.segments_min)
+                    segments_min = 52428800
+                self.segments_min = segments_min
+        else:
+            self.segments = 0
         if self.rate:
             rate = text.parse_bytes(self.rate)
             if rate:
@@ -109,6 +124,10 @@ class HttpDownloader(DownloaderBase):
         if self.part and not metadata:
             pathfmt.part_enable(self.partdir)
 
+        segments = self.segments and self.part and \
+            kwdict.get("_http_method", "GET") == "GET" and \
+            not kwdict.get("_http_data")
+
         while True:
             if tries:
                 if response:
@@ -133,6 +152,12 @@ class HttpDownloader(DownloaderBase):
                 headers.update(self.headers)
             #   partial content
             file_size = pathfmt.part_size()
+            segments_state = file_size and \
+                os.path.exists(pathfmt.temppath + ".segments")
+            if segments_state:
+                # preallocated file of a segmented download,
+                # even when 'segments' is disabled now
+                file_size = 0
             if file_size:
                 headers["Range"] = "bytes={}-".format(file_size)
 
@@ -257,6 +282,25 @@ class HttpDownloader(DownloaderBase):
                     response.close()
                     return True
 
+            # segmented download
+            if segments and size and size >= self.segments_min and \
+                    not offset and \
+                    response.headers.get("Accept-Ranges") == "bytes":
+                self.downloading = True
+                msg = self._download_segments(
+                    url, pathfmt, response, content, file_header,
+                    size, headers)
+                if msg is None:
+                    break
+                if msg is False:
+                    # server does not support concurrent range requests
+                    msg = "Segmented download failed"
+                    segments = False
+                    util.remove_file(pathfmt.temppath)
+                response = None
+                print()
+                continue
+
             # set open mode
             if not offset:
                 mode = "w+b"
@@ -269,6 +313,9 @@ class HttpDownloader(DownloaderBase):
             # download content
             self.downloading = True
             with pathfmt.open(mode) as fp:
+                if segments_state:
+                    # its preallocated data is gone now
+                    util.remove_file(pathfmt.temppath + ".segments")
                 if file_header:
                     fp.write(file_header)
                     offset += len(file_header)
@@ -303,6 +350,198 @@ class HttpDownloader(DownloaderBase):
 
         return True
 
+    def _download_segments(self, url, pathfmt, response, content,
+                           file_header, size, headers):
+        """Download 'size' bytes in parallel ranges
+
+        Returns None on success, an error message for failures
+        that can be resumed by retrying, and False when the server
+        does not handle range requests properly.
+        """
+        path = pathfmt.temppath
+        path_state = path + ".segments"
+        headers.pop("Range", None)
+
+        segments = self._segments_load(path_state, size)
+        if segments:
+            self.log.debug("Resuming segmented download")
+            response.close()
+            response = content = None
+        else:
+            segments = self._segments_init(size, self.segments)
+            if file_header:
+                segments[0][0] = len(file_header)
+            with pathfmt.open("w+b") as fp:
+                # store state before preallocating, otherwise
+                # its full size would look like a finished download
+                self._segments_store(path_state, size, segments)
+                fp.truncate(size)
+                if file_header:
+                    fp.write(file_header)
+
+        lock = threading.Lock()
+        stop = threading.Event()
+        errors = []
+        threads = []
+        rate = self.rate // len(segments) if self.rate else 0
+        for segment in segments:
+            if segment[0] >= segment[1]:
+                continue
+            args = (url, path, headers, segment, response, content,
+                    rate, lock, stop, errors)
+            response = content = None
+            thread = threading.Thread(
+                target=self._segment_worker, args=args, daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        self.out.start(pathfmt.path)
+        interval = self.progress or 1.0
+        bytes_start = size - sum(end - pos for pos, end in segments)
+        time_start = time.monotonic()
+        try:
+            for thread in threads:
+                while thread.is_alive():
+                    thread.join(interval)
+                    with lock:
+                        self._segments_store(path_state, size, segments)
+                        remaining = sum(end - pos for pos, end in segments)
+                    time_elapsed = time.monotonic() - time_start
+                    if self.progress is not None and time_elapsed:
+                        bytes_downloaded = size - remaining - bytes_start
+                        self.out.progress(
+                            size, size - remaining,
+                            int(bytes_downloaded / time_elapsed))
+        finally:
+            stop.set()
+            with lock:
+                self._segments_store(path_state, size, segments)
+
+        for error in errors:
+            if error is False:
+                util.remove_file(path_state)
+                return False
+        if errors:
+            return errors[0]
+
+        for pos, end in segments:
+            if pos < end:
+                return "file size mismatch ({} < {})".format(pos, end)
+        util.remove_file(path_state)
+        return None
+
+    def _segment_worker(self, url, path, headers, segment, response,
+                        content, rate, lock, stop, errors):
+        """Download 'segment' from 'response' or a new range request"""
+        tries = 0
+        msg = ""
+
+        while segment[0] < segment[1] and not stop.is_set():
+            if content is None:
+                if tries:
+                    self.log.debug("%s (%s/%s)", msg, tries, self.retries+1)
+                    if tries > self.retries:
+                        break
+                    time.sleep(tries)
+                tries += 1
+
+                headers_range = headers.copy()
+                headers_range["Range"] = "bytes={}-{}".format(
+                    segment[0], segment[1] - 1)
+                try:
+                    response = self.session.request(
+                        "GET", url,
+                        stream=True,
+                        headers=headers_range,
+                        timeout=self.timeout,
+                        proxies=self.proxies,
+                        verify=self.verify,
+                    )
+                except (ConnectionError, Timeout) as exc:
+                    msg = str(exc)
+                    continue
+                except Exception as exc:
+                    msg = str(exc)
+                    break
+
+                code = response.status_code
+                if code != 206:
+                    response.close()
+                    msg = "'{} {}' for '{}'".format(
+                        code, response.reason, url)
+                    if code in self.retry_codes or 500 <= code < 600:
+                        continue
+                    msg = False
+                    break
+                if not response.headers.get("Content-Range", "").startswith(
+                        "bytes {}-".format(segment[0])):
+                    response.close()
+                    msg = False
+                    break
+                content = response.iter_content(self.chunk_size)
+
+            bytes_downloaded = 0
+            time_start = time.monotonic()
+            try:
+                with open(path, "r+b", buffering=0) as fp:
+                    fp.seek(segment[0])
+                    for data in content:
+                        remaining = segment[1] - segment[0]
+                        if len(data) > remaining:
+                            data = data[:remaining]
+                        fp.write(data)
+                        with lock:
+                            segment[0] += len(data)
+                        if segment[0] >= segment[1] or stop.is_set():
+                            break
+
+                        if rate:
+                            bytes_downloaded += len(data)
+                            time_expected = bytes_downloaded / rate
+                            time_elapsed = time.monotonic() - time_start
+                            if time_expected > time_elapsed:
+                                time.sleep(time_expected - time_elapsed)
+            except (RequestException, SSLError, OpenSSLError) as exc:
+                msg = str(exc)
+            else:
+                msg = "segment incomplete ({} < {})".format(*segment)
+            finally:
+                response.close()
+                response = content = None
+        else:
+            return
+
+        with lock:
+            errors.append(msg)
+        stop.set()
+
+    @staticmethod
+    def _segments_init(size, num):
+        """Split 'size' bytes into 'num' [position, end] ranges"""
+        step = size // num
+        segments = [[step * i, step * (i + 1)] for i in range(num)]
+        segments[-1][1] = size
+        return segments
+
+    @staticmethod
+    def _segments_load(path, size):
+        """Load segment state from 'path' when it matches 'size'"""
+        try:
+            with open(path) as fp:
+                state = json.load(fp)
+            if state["size"] == size:
+                return state["segments"]
+        except (OSError, ValueError, KeyError, TypeError):
+            pass
+        return None
+
+    @staticmethod
+    def _segments_store(path, size, segments):
+        """Write segment state to 'path'"""
+        with open(path + ".tmp", "w") as fp:
+            json.dump({"size": size, "segments": segments}, fp)
+        os.replace(path + ".tmp", path)
+
     def release_conn(self, response):
         """Release connection back to pool by consuming response body"""
         try:
@@ -7,7 +7,9 @@
 # published by the Free Software Foundation.
 
 import sys
+import os
 import re
+import json
 
 modules = [
     "2chan",
@@ -188,10 +190,15 @@ modules = [
     "generic",
 ]
 
+if sys.version_info < (3, 6):
+    # modules based on 'asynchronous.AsyncExtractor'
+    for module_name in ("kemonoparty",):
+        modules.remove(module_name)
+
 
 def find(url):
     """Find a suitable extractor for the given URL"""
-    for cls in _list_classes():
+    for cls in _candidates(url):
         match = cls.pattern.match(url)
         if match:
             return cls(match)
@@ -236,6 +243,321 @@ def _list_classes():
     globals()["_list_classes"] = lambda : _cache
 
 
+def _candidates(url):
+    """Return extractor classes whose pattern might match 'url'"""
+    global _index
+
+    if not isinstance(url, str):
+        return _list_classes()
+
+    index = _index
+    if index is None:
+        path = _registry_path()
+        if path:
+            index = _registry_load(path)
+            if index is None and _registry_writable(path):
+                index = DispatchIndex(_list_classes())
+                _registry_store(path, index)
+        if index is None:
+            # no usable registry file:
+            # linear search on first use, importing modules as needed
+            _index = False
+            return _list_classes()
+        _index = index
+    elif not index or index.size != len(_cache):
+        index = _index = DispatchIndex(_list_classes())
+    return index.candidates(url)
+
+
+class DispatchIndex():
+    """Map words of a URL to the extractor classes that could match it
+
+    Every class gets indexed by a word fragment that is present
+    in all URLs its pattern matches. Classes without such a fragment
+    are returned as candidates for every URL.
+    """
+
+    def __init__(self, classes, tokens=None):
+        self.classes = classes = list(classes)
+        self.size = len(classes)
+        self.fallback = []
+        self.words = {}
+        self.prefixes = {}
+        self.suffixes = {}
+
+        if tokens is None:
+            tokens = [_pattern_tokens(cls.pattern) for cls in classes]
+        self.tokens = tokens
+
+        for num, class_tokens in enumerate(tokens):
+            if class_tokens is None:
+                self.fallback.append(num)
+                continue
+            for kind, token in class_tokens:
+                getattr(self, kind).setdefault(token, []).append(num)
+
+        self.prefix_lengths = sorted(set(map(len, self.prefixes)))
+        self.suffix_lengths = sorted(set(map(len, self.suffixes)))
+
+    def candidates(self, url):
+        """Return possibly matching classes in their original order"""
+        words = self.words
+        prefixes = self.prefixes
+        suffixes = self.suffixes
+        result = set(self.fallback)
+
+        for word in _split_words(url.lower()):
+            if word in words:
+                result.update(words[word])
+            length = len(word)
+            for num in self.prefix_lengths:
+                if num > length:
+                    break
+                if word[:num] in prefixes:
+                    result.update(prefixes[word[:num]])
+            for num in self.suffix_lengths:
+                if num > length:
+                    break
+                if word[-num:] in suffixes:
+                    result.update(suffixes[word[-num:]])
+
+        classes = self.classes
+        return [classes[num] for num in sorted(result)]
+
+
+class RegistryIndex(DispatchIndex):
+    """DispatchIndex built from the entries of a registry file
+
+    Each entry is a (module, class name, pattern, flags, tokens) list.
+    Extractor modules only get imported
+    when one of their patterns matches a URL.
+    """
+
+    def __init__(self, entries):
+        DispatchIndex.__init__(
+            self, entries, [entry[4] for entry in entries])
+        # stays valid as long as no classes have been loaded into '_cache'
+        self.size = 0
+
+    def candidates(self, url):
+        globals_ = globals()
+        for module_name, class_name, pattern, flags, _ in \
+                DispatchIndex.candidates(self, url):
+            if re.compile(pattern, flags).match(url):
+                module = __import__(module_name, globals_, None, (), 1)
+                cls = getattr(module, class_name)
+                if isinstance(cls.pattern, str):
+                    cls.pattern = re.compile(cls.pattern)
+                yield cls
+
+
+def _registry_path():
+    """Return the path of the extractor registry file or None"""
+    if _cache or getattr(_module_iter, "gi_code", None) is not \
+            _modules_internal.__code__:
+        return None
+
+    from .. import config, util
+    path = config.get(("extractor",), "module-registry", True)
+    if not path:
+        return None
+    if path is True:
+        return os.path.join(util.cache_directory(), "extractors.json")
+    return util.expand_path(path)
+
+
+def _registry_writable(path):
+    """Return True if a registry file can be created at 'path'"""
+    try:
+        _registry_key()
+        directory = os.path.dirname(path) or "."
+        os.makedirs(directory, exist_ok=True)
+        return os.access(directory, os.W_OK)
+    except Exception:
+        return False
+
+
+def _registry_key():
+    """Return data a registry file has to match to be considered valid"""
+    from .. import version
+
+    mtime = 0.0
+    directory = os.path.dirname(__file__)
+    for name in os.listdir(directory):
+        if name.endswith(".py"):
+            mtime = max(mtime, os.stat(os.path.join(directory, name)).st_mtime)
+
+    return {
+        "version": version.__version__,
+        "python" : sys.hexversion,
+        "mtime"  : mtime,
+        "modules": list(modules),
+    }
+
+
+def _registry_config(names):
+    """Return the config values extractor patterns depend on"""
+    from .. import config
+    return {
+        name: json.dumps(config.get(("extractor",), name),
+                         sort_keys=True, default=str)
+        for name in names
+    }
+
+
+def _registry_load(path):
+    """Return a RegistryIndex for 'path' or None if it is outdated"""
+    try:
+        with open(path, encoding="utf-8") as fp:
+            registry = json.load(fp)
+        if registry["key"] != _registry_key() or registry["config"] != \
+                _registry_config(registry["config"]):
+            return None
+        return RegistryIndex(registry["extractors"])
+    except Exception:
+        return None
+
+
+def _registry_store(path, index):
+    """Write pattern data of all classes in 'index' to 'path'"""
+    from .common import BaseExtractor
+
+    try:
+        # config values used in class bodies to build patterns
+        names = {"generic", "ytdl"}
+        entries = []
+        for cls, tokens in zip(index.classes, index.tokens):
+            if not cls.__module__.startswith(__name__ + "."):
+                return
+            if issubclass(cls, BaseExtractor):
+                names.add(cls.basecategory)
+            entries.append((
+                cls.__module__.rpartition(".")[2], cls.__name__,
+                cls.pattern.pattern, cls.pattern.flags,
+                None if tokens is None else sorted(tokens),
+            ))
+
+        registry = {
+            "key"       : _registry_key(),
+            "config"    : _registry_config(names),
+            "extractors": entries,
+        }
+
+        path_tmp = "{}.{}.tmp".format(path, os.getpid())
+        with open(path_tmp, "w", encoding="utf-8") as fp:
+            json.dump(registry, fp, separators=(",", ":"))
+        os.replace(path_tmp, path)
+    except Exception:
+        pass
+
+
+def _pattern_tokens(pattern):
+    """Return a set of (kind, token) tuples for a compiled regex 'pattern'
+
+    At least one of these tokens is part of every string matched by
+    'pattern', either as a complete "word" (a maximal run of ASCII
+    letters and digits) or as prefix or suffix of a word.
+    Returns None if no such tokens could be determined.
+    """
+    try:
+        parsed = _sre_parse.parse(pattern.pattern, pattern.flags)
+    except Exception:
+        return None
+    # a match always starts at the beginning of a string
+    return _tokens_sequence(parsed, "\0", None)
+
+
+def _tokens_sequence(sequence, before, after):
+    items = [before]
+    _flatten(sequence, items)
+    items.append(after)
+
+    best = None
+    best_score = 0
+
+    # word fragments between known boundaries
+    for start, end in _word_spans(items):
+        bound_l = start and items[start-1].__class__ is str
+        bound_r = items[end].__class__ is str
+        if bound_l or bound_r:
+            token = "".join(items[start:end]).lower()
+            if len(token) > best_score:
+                best_score = len(token)
+                best = {(
+                    "words" if bound_l and bound_r else
+                    "prefixes" if bound_l else "suffixes", token)}
+
+    # alternatives and repetitions
+    for index, item in enumerate(items):
+        if item.__class__ is not tuple:
+            continue
+        kind, value = item
+
+        if kind == "branch":
+            edge_l = items[index-1]
+            edge_r = items[index+1]
+            if edge_l.__class__ is tuple:
+                edge_l = None
+            if edge_r.__class__ is tuple:
+                edge_r = None
+
+            tokens = set()
+            for alternative in value:
+                result = _tokens_sequence(alternative, edge_l, edge_r)
+                if result is None:
+                    break
+                tokens.update(result)
+            else:
+                score = min(len(token) for _, token in tokens)
+                if score > best_score:
+                    best_score = score
+                    best = tokens
+
+        else:  # "repeat"
+            tokens = _tokens_sequence(value, None, None)
+            if tokens:
+                score = min(len(token) for _, token in tokens)
+                if score > best_score:
+                    best_score = score
+                    best = tokens
+
+    return best
+
+
+def _flatten(sequence, items):
+    """Convert a parsed regex into a list of characters and placeholders"""
+    const = _sre_constants
+    for op, av in sequence:
+        if op is const.LITERAL:
+            items.append(chr(av))
+        elif op is const.SUBPATTERN or op is _ATOMIC_GROUP:
+            _flatten(av[-1] if op is const.SUBPATTERN else av, items)
+        elif op is const.AT:
+            items.append("\0" if av in _AT_BOUNDARIES else None)
+        elif op is const.BRANCH:
+            items.append(("branch", av[1]))
+        elif op in _REPEATS:
+            minimum, maximum, item = av
+            if minimum == maximum == 1:
+                _flatten(item, items)
+            elif maximum:
+                items.append(("repeat", item) if minimum else None)
+        else:
+            items.append(None)
+
+
+def _word_spans(items):
+    """Yield (start, end) index pairs of word characters in 'items'"""
+    start = None
+    for index, item in enumerate(items):
+        if item.__class__ is str and item in _WORD_CHARS:
+            if start is None:
+                start = index
+        elif start is not None:
+            yield start, index
+            start = None
+
+
 def _modules_internal():
     globals_ = globals()
     for module_name in modules:
@@ -264,4 +586,22 @@ def _get_classes(module):
 
 
 _cache = []
+_index = None
 _module_iter = _modules_internal()
+
+try:
+    from re import _parser as _sre_parse, _constants as _sre_constants
+except ImportError:
+    import sre_parse as _sre_parse
+    import sre_constants as _sre_constants
+
+_split_words = re.compile(r"[0-9a-z]+").findall
+_WORD_CHARS = frozenset("0123456789abcdefghijklmnopqrstuvwxyz"
+                        "ABCDEFGHIJKLMNOPQRSTUVWXYZ")
+_AT_BOUNDARIES = frozenset(getattr(_sre_constants, name) for name in (
+    "AT_BEGINNING", "AT_BEGINNING_STRING", "AT_BOUNDARY",
+    "AT_END", "AT_END_STRING"))
+_REPEATS = frozenset(getattr(_sre_constants, name) for name in (
+    "MAX_REPEAT", "MIN_REPEAT", "POSSESSIVE_REPEAT")
+    if hasattr(_sre_constants, name))
+_ATOMIC_GROUP = getattr(_sre_constants, "ATOMIC_GROUP", None)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+
+"""Base class for extractors built on asyncio (requires Python 3.6+)"""
+
+from .common import Extractor
+import concurrent.futures
+import functools
+import asyncio
+
+try:
+    all_tasks = asyncio.all_tasks
+except AttributeError:
+    # Python 3.6
+    all_tasks = asyncio.Task.all_tasks
+
+
+class AsyncExtractor(Extractor):
+    """Extractor with a coroutine-based 'items()'
+
+    'items()' is an asynchronous generator. Iterating over an instance
+    drives it on a private event loop and yields its messages
+    synchronously, the same way a regular Extractor's messages are
+    consumed by a Job. Subclasses may still implement a regular 'items()'.
+
+    'request_async()' runs Extractor.request() in a thread pool of
+    'request-concurrency' threads, which makes it possible to
+    fetch several pages at once with 'map()'.
+    'request()' itself stays synchronous.
+    """
+    request_concurrency = 4
+
+    def __iter__(self):
+        self.initialize()
+        items = self.items()
+        if hasattr(items, "__anext__"):
+            return self._iter_items(items)
+        return items
+
+    def _init_options(self):
+        Extractor._init_options(self)
+        self._concurrency = self.config(
+            "request-concurrency", self.request_concurrency)
+        if self._interval or self._concurrency < 1:
+            # a fixed delay between requests implies sequential requests
+            self._concurrency = 1
+
+    async def items(self):
+        return
+        yield
+
+    async def request_async(self, url, **kwargs):
+        """Asynchronous version of Extractor.request()"""
+        return await self._loop.run_in_executor(
+            self._executor,
+            functools.partial(self.request, url, **kwargs))
+
+    async def request_json_async(self, url, **kwargs):
+        """Send a request and return its decoded JSON response"""
+        response = await self.request_async(url, **kwargs)
+        return response.json()
+
+    async def map(self, func, iterable):
+        """Yield the results of coroutine 'func' for each element
+
+        Up to 'request-concurrency' coroutines run at the same time,
+        results are yielded in input order.
+        """
+        pending = []
+        for item in iterable:
+            pending.append(self._loop.create_task(func(item)))
+            if len(pending) > self._concurrency:
+                yield await pending.pop(0)
+        try:
+            while pending:
+                yield await pending.pop(0)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def _iter_items(self, items):
+        loop = self._loop = asyncio.new_event_loop()
+        self._executor = concurrent.futures.ThreadPoolExecutor(
+            self._concurrency)
+        anext = items.__anext__
+
+        try:
+            while True:
+                try:
+                    msg = loop.run_until_complete(anext())
+                except StopAsyncIteration:
+                    return
+                yield msg
+        finally:
+            loop.run_until_complete(items.aclose())
+            loop.run_until_complete(loop.shutdown_asyncgens())
+            tasks = [task for task in all_tasks(loop) if not task.done()]
+            if tasks:
+                for task in tasks:
+                    task.cancel()
+                loop.run_until_complete(asyncio.gather(
+                    *tasks, return_exceptions=True))
+            self._executor.shutdown(wait=False)
+            loop.close()
@@ -15,10 +15,13 @@ import time
 import netrc
 import queue
 import logging
+import functools
 import datetime
 import requests
 import threading
+import urllib.parse
 from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
 from .message import Message
 from .. import config, text, util, cache, exception
 
@@ -40,12 +43,15 @@ class Extractor():
     request_interval = 0.0
     request_interval_min = 0.0
     request_timestamp = 0.0
+    archive_stop = 0
+    archive_files = archive_hits = archive_pages = 0
 
     def __init__(self, match):
         self.log = logging.getLogger(self.category)
         self.url = match.string
         self._cfgpath = ("extractor", self.category, self.subcategory)
         self._parentdir = ""
+        self._limiter = None
 
     @classmethod
     def from_url(cls, url):
@@ -66,7 +72,10 @@ class Extractor():
         self.initialize = util.noop
 
     def finalize(self):
-        pass
+        if self._limiter:
+            self._limiter.log_stats(self.log)
+        if "session" in self.__dict__:
+            _log_pool_stats(self.session, self.log)
 
     def items(self):
         yield Message.Version, 1
@@ -74,8 +83,33 @@ class Extractor():
     def skip(self, num):
         return 0
 
+    def stop_pagination(self):
+        """Return True if no further result pages should be requested
+
+        This is the case after 'archive-stop' consecutive pages
+        whose files were all already in the download archive.
+        """
+        if not self.archive_stop:
+            return False
+
+        files = self.archive_files
+        hits = self.archive_hits
+        self.archive_files = self.archive_hits = 0
+        if not files:
+            return False
+        if hits < files:
+            self.archive_pages = 0
+            return False
+
+        self.archive_pages += 1
+        if self.archive_pages < self.archive_stop:
+            return False
+        self.log.info("Stopping pagination after %s page(s) of "
+                      "archived files", self.archive_pages)
+        return True
+
     def config(self, key, default=None):
-        return config.interpolate(self._cfgpath, key, default)
+        return config.view(self._cfgpath).get(key, default)
 
     def config_deprecated(self, key, deprecated, default=None,
                           sentinel=util.SENTINEL, history=set()):
@@ -96,8 +130,8 @@ class Extractor():
         return config.accumulate(self._cfgpath, key)
 
     def _config_shared(self, key, default=None):
-        return config.interpolate_common(
-            ("extractor",), self._cfgpath, key, default)
+        return config.view_common(
+            ("extractor",), self._cfgpath).get(key, default)
 
     def _config_shared_accumulate(self, key):
         first = True
@@ -139,6 +173,11 @@ class Extractor():
                 self.sleep(seconds, "request")
 
         while True:
+            if self._limiter:
+                seconds = self._limiter(url)
+                if seconds > 0.0:
+                    self.sleep(seconds, "rate limit")
+
             try:
                 response = session.request(method, url, **kwargs)
             except (requests.exceptions.ConnectionError,
@@ -258,6 +297,18 @@ class Extractor():
         if not self._retry_codes:
             self._retry_codes = ()
 
+        rate = self.config("request-rate")
+        if rate:
+            try:
+                rate, burst = rate
+            except TypeError:
+                burst = 1
+            rate = float(rate)
+            if self.config("request-rate-scope") == "host":
+                self._limiter = HostRateLimiter(rate, burst)
+            else:
+                self._limiter = _rate_limiter(self.category, rate, burst)
+
     def _init_session(self):
         self.session = session = requests.Session()
         headers = session.headers
@@ -343,8 +394,27 @@ class Extractor():
             ssl_options |= ssl.OP_NO_TLSv1_2
             self.log.debug("TLS 1.2 disabled.")
 
-        adapter = _build_requests_adapter(
-            ssl_options, ssl_ciphers, source_address)
+        pool_connections = self.config("pool-connections", 10)
+        pool_maxsize = self.config("pool-maxsize")
+        if not pool_maxsize:
+            # one connection per concurrent download and some headroom
+            pool_maxsize = max(10, (self.config("downloads-concurrent") or 1))
+        pool_idle_timeout = self.config("pool-idle-timeout")
+
+        transport = self.config("transport")
+        if transport:
+            try:
+                adapter = _build_transport_adapter(
+                    transport, ssl_options, ssl_ciphers, source_address,
+                    pool_maxsize, pool_idle_timeout)
+            except Exception as exc:
+                self.log.error("Unable to use '%s' transport (%s: %s)",
+                               transport, exc.__class__.__name__, exc)
+                transport = None
+        if not transport:
+            adapter = _build_requests_adapter(
+                ssl_options, ssl_ciphers, source_address,
+                pool_connections, pool_maxsize, pool_idle_timeout)
         session.mount("https://", adapter)
         session.mount("http://", adapter)
 
@@ -747,26 +817,130 @@ class BaseExtractor(Extractor):
         )
 
 
+class RateLimiter():
+    """Token bucket shared by all requests with the same key"""
+
+    def __init__(self, key, rate, burst=1):
+        self.key = key
+        self.rate = rate
+        self.burst = self.tokens = burst
+        self.timestamp = time.monotonic()
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.waited = 0.0
+
+    def __call__(self, url=None):
+        """Take a token and return the seconds to wait before using it"""
+        with self.lock:
+            now = time.monotonic()
+            tokens = self.tokens + (now - self.timestamp) * self.rate
+            if tokens > self.burst:
+                tokens = self.burst
+            self.tokens = tokens = tokens - 1
+            self.timestamp = now
+            self.requests += 1
+
+            if tokens >= 0.0:
+                return 0.0
+            # negative tokens reserve a slot for concurrent callers
+            seconds = -tokens / self.rate
+            self.waited += seconds
+            return seconds
+
+    def log_stats(self, log):
+        log.debug("Rate limit '%s': %d requests, waited %.2f seconds",
+                  self.key, self.requests, self.waited)
+
+
+class HostRateLimiter():
+    """Use a separate shared token bucket for each host"""
+
+    def __init__(self, rate, burst=1):
+        self.rate = rate
+        self.burst = burst
+        self.hosts = set()
+
+    def __call__(self, url):
+        host = urllib.parse.urlsplit(url).hostname or ""
+        self.hosts.add(host)
+        return _rate_limiter(host, self.rate, self.burst)()
+
+    def log_stats(self, log):
+        for host in sorted(self.hosts):
+            _rate_limiters[(host, self.rate, self.burst)].log_stats(log)
+
+
 class RequestsAdapter(HTTPAdapter):
 
-    def __init__(self, ssl_context=None, source_address=None):
+    def __init__(self, ssl_context=None, source_address=None,
+                 pool_connections=10, pool_maxsize=10, idle_timeout=None):
         self.ssl_context = ssl_context
         self.source_address = source_address
-        HTTPAdapter.__init__(self)
+        self.idle_timeout = idle_timeout
+        HTTPAdapter.__init__(self, pool_connections, pool_maxsize)
 
     def init_poolmanager(self, *args, **kwargs):
         kwargs["ssl_context"] = self.ssl_context
         kwargs["source_address"] = self.source_address
-        return HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+        HTTPAdapter.init_poolmanager(self, *args, **kwargs)
+        self._init_pool_classes(self.poolmanager)
 
     def proxy_manager_for(self, *args, **kwargs):
         kwargs["ssl_context"] = self.ssl_context
         kwargs["source_address"] = self.source_address
-        return HTTPAdapter.proxy_manager_for(self, *args, **kwargs)
+        manager = HTTPAdapter.proxy_manager_for(self, *args, **kwargs)
+        self._init_pool_classes(manager)
+        return manager
+
+    def _init_pool_classes(self, manager):
+        if self.idle_timeout:
+            manager.pool_classes_by_scheme = {
+                "http" : functools.partial(
+                    HTTPIdleConnectionPool, idle_timeout=self.idle_timeout),
+                "https": functools.partial(
+                    HTTPSIdleConnectionPool, idle_timeout=self.idle_timeout),
+            }
+
+
+class IdleConnectionPoolMixin():
+    """Close pooled connections that have not been used for a while
+
+    Servers tend to silently drop idle keep-alive connections,
+    which otherwise results in failed requests and retries.
+    """
+
+    def __init__(self, *args, idle_timeout=None, **kwargs):
+        self.idle_timeout = idle_timeout
+        self.num_expired = 0
+        super().__init__(*args, **kwargs)
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        released = getattr(conn, "_gdl_released", None)
+        if released and time.monotonic() - released > self.idle_timeout:
+            self.num_expired += 1
+            conn.close()
+        return conn
 
+    def _put_conn(self, conn):
+        if conn is not None:
+            conn._gdl_released = time.monotonic()
+        return super()._put_conn(conn)
 
-def _build_requests_adapter(ssl_options, ssl_ciphers, source_address):
-    key = (ssl_options, ssl_ciphers, source_address)
+
+class HTTPIdleConnectionPool(IdleConnectionPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class HTTPSIdleConnectionPool(IdleConnectionPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+def _build_requests_adapter(ssl_options, ssl_ciphers, source_address,
+                            pool_connections=10, pool_maxsize=10,
+                            idle_timeout=None):
+    key = (ssl_options, ssl_ciphers, source_address,
+           pool_connections, pool_maxsize, idle_timeout)
     try:
         return _adapter_cache[key]
     except KeyError:
@@ -783,10 +957,71 @@ def _build_requests_adapter(ssl_options, ssl_ciphers, source_address):
         ssl_context = None
 
     adapter = _adapter_cache[key] = RequestsAdapter(
-        ssl_context, source_address)
+        ssl_context, source_address,
+        pool_connections, pool_maxsize, idle_timeout)
+    return adapter
+
+
+def _build_transport_adapter(name, ssl_options, ssl_ciphers, source_address,
+                             pool_maxsize=10, idle_timeout=None):
+    key = (name, ssl_options, ssl_ciphers, source_address,
+           pool_maxsize, idle_timeout)
+    try:
+        return _adapter_cache[key]
+    except KeyError:
+        pass
+
+    if name == "httpx":
+        from .. import transport
+        adapter = transport.HttpxAdapter(
+            ssl_options, ssl_ciphers, source_address,
+            pool_maxsize, idle_timeout)
+    else:
+        raise ValueError("unsupported transport")
+
+    _adapter_cache[key] = adapter
     return adapter
 
 
+def _log_pool_stats(session, log):
+    """Log per-host request and connection counts of 'session'
+
+    Its adapters and their pools are shared with all other extractors
+    using the same pool settings, so these counts are process-wide
+    and not limited to requests of the current extractor.
+    """
+    managers = []
+    for adapter in session.adapters.values():
+        manager = getattr(adapter, "poolmanager", None)
+        if manager is not None and manager not in managers:
+            managers.append(manager)
+            managers.extend(getattr(adapter, "proxy_manager", {}).values())
+
+    for manager in managers:
+        pools = manager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is None or not pool.num_requests:
+                continue
+            log.debug("Connection pool %s://%s (process-wide): "
+                      "%s requests, %s connections, %s expired",
+                      pool.scheme, pool.host, pool.num_requests,
+                      pool.num_connections,
+                      getattr(pool, "num_expired", 0))
+
+
+def _rate_limiter(key, rate, burst=1):
+    """Return the RateLimiter shared by all users of 'key'
+
+    Users with different 'rate' or 'burst' values get their own one.
+    """
+    try:
+        return _rate_limiters[(key, rate, burst)]
+    except KeyError:
+        return _rate_limiters.setdefault(
+            (key, rate, burst), RateLimiter(key, rate, burst))
+
+
 @cache.cache(maxage=86400)
 def _browser_useragent():
     """Get User-Agent header from default browser"""
@@ -819,6 +1054,7 @@ def _browser_useragent():
 
 _adapter_cache = {}
 _browser_cookies = {}
+_rate_limiters = {}
 
 
 HTTP_HEADERS = {
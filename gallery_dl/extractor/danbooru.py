@@ -124,7 +124,7 @@ class DanbooruExtractor(BaseExtractor):
 
                 yield from posts
 
-            if len(posts) < self.threshold:
+            if len(posts) < self.threshold or self.stop_pagination():
                 return
 
             if prefix:
@@ -8,7 +8,8 @@
 
 """Extractors for https://kemono.party/"""
 
-from .common import Extractor, Message
+from .common import Message
+from .asynchronous import AsyncExtractor
 from .. import text, exception
 from ..cache import cache, memcache
 import itertools
@@ -19,7 +20,7 @@ USER_PATTERN = BASE_PATTERN + r"/([^/?#]+)/user/([^/?#]+)"
 HASH_PATTERN = r"/[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})"
 
 
-class KemonopartyExtractor(Extractor):
+class KemonopartyExtractor(AsyncExtractor):
     """Base class for kemonoparty extractors"""
     category = "kemonoparty"
     root = "https://kemono.party"
@@ -34,7 +35,7 @@ class KemonopartyExtractor(Extractor):
         self.category = domain + "party"
         self.root = text.root_from_url(match.group(0))
         self.cookies_domain = ".{}.{}".format(domain, tld)
-        Extractor.__init__(self, match)
+        AsyncExtractor.__init__(self, match)
 
     def _init(self):
         self._prepare_ddosguard_cookies()
@@ -42,11 +43,10 @@ class KemonopartyExtractor(Extractor):
             r'src="(?:https?://(?:kemono|coomer)\.(?:party|su))?(/inline/[^"]+'
             r'|/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.[^"]+)').findall
 
-    def items(self):
+    async def items(self):
         find_hash = re.compile(HASH_PATTERN).match
         generators = self._build_file_generators(self.config("files"))
         duplicates = self.config("duplicates")
-        comments = self.config("comments")
         username = dms = None
 
         # prevent files from being sent with gzip compression
@@ -63,8 +63,13 @@ class KemonopartyExtractor(Extractor):
         max_posts = self.config("max-posts")
         if max_posts:
             posts = itertools.islice(posts, max_posts)
+        if self.config("comments"):
+            # fetch comments of several posts at once
+            posts = self.map(self._extract_comments, posts)
+        else:
+            posts = _aiter(posts)
 
-        for post in posts:
+        async for post in posts:
 
             headers["Referer"] = "{}/{}/user/{}/post/{}".format(
                 self.root, post["service"], post["user"], post["id"])
@@ -74,8 +79,6 @@ class KemonopartyExtractor(Extractor):
                 "%a, %d %b %Y %H:%M:%S %Z")
             if username:
                 post["username"] = username
-            if comments:
-                post["comments"] = self._extract_comments(post)
             if dms is not None:
                 if dms is True:
                     dms = self._extract_dms(post)
@@ -172,10 +175,10 @@ class KemonopartyExtractor(Extractor):
             filetypes = filetypes.split(",")
         return [genmap[ft] for ft in filetypes]
 
-    def _extract_comments(self, post):
+    async def _extract_comments(self, post):
         url = "{}/{}/user/{}/post/{}".format(
             self.root, post["service"], post["user"], post["id"])
-        page = self.request(url).text
+        page = (await self.request_async(url)).text
 
         comments = []
         for comment in text.extract_iter(page, "<article", "</article>"):
@@ -188,7 +191,8 @@ class KemonopartyExtractor(Extractor):
                     '<section class="comment__body">', '</section>').strip(),
                 "date": extr('datetime="', '"'),
             })
-        return comments
+        post["comments"] = comments
+        return post
 
     def _extract_dms(self, post):
         url = "{}/{}/user/{}/dms".format(
@@ -213,6 +217,11 @@ class KemonopartyExtractor(Extractor):
         return self.request(url).json()
 
 
+async def _aiter(iterable):
+    for item in iterable:
+        yield item
+
+
 def _validate(response):
     return (response.headers["content-length"] != "9" or
             response.content != b"not found")
@@ -241,7 +250,7 @@ class KemonopartyUserExtractor(KemonopartyExtractor):
             yield from posts
 
             cnt = len(posts)
-            if cnt < 25:
+            if cnt < 25 or self.stop_pagination():
                 return
             params["o"] += cnt
 
@@ -352,7 +361,7 @@ class KemonopartyDiscordExtractor(KemonopartyExtractor):
             yield from posts
 
             cnt = len(posts)
-            if cnt < 25:
+            if cnt < 25 or self.stop_pagination():
                 break
             params["skip"] += cnt
 
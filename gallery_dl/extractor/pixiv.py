@@ -986,7 +986,7 @@ class PixivAppAPI():
             data = self._call(endpoint, params)
             yield from data[key]
 
-            if not data["next_url"]:
+            if not data["next_url"] or self.extractor.stop_pagination():
                 return
             query = data["next_url"].rpartition("?")[2]
             params = text.parse_query(query)
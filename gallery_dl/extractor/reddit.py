@@ -478,7 +478,7 @@ class RedditAPI():
                     elif kind == "t1" and self.comments:
                         yield None, (post,)
 
-            if not data["after"]:
+            if not data["after"] or self.extractor.stop_pagination():
                 return
             params["after"] = data["after"]
 
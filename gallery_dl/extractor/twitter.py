@@ -1389,6 +1389,8 @@ class TwitterAPI():
             # stop on empty response
             if not cursor or (not tweets and not tweet_id):
                 return
+            if self.extractor.stop_pagination():
+                return
             params["cursor"] = cursor
 
     def _pagination_tweets(self, endpoint, variables,
@@ -1561,6 +1563,8 @@ class TwitterAPI():
                 return
             if not cursor or cursor == variables.get("cursor"):
                 return
+            if extr.stop_pagination():
+                return
             variables["cursor"] = cursor
 
     def _pagination_users(self, endpoint, variables, path=None):
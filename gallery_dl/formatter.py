@@ -28,7 +28,7 @@ def parse(format_string, default=NONE, fmt=format):
     except KeyError:
         pass
 
-    cls = StringFormatter
+    cls = CompiledFormatter if _COMPILE else StringFormatter
     if format_string.startswith("\f"):
         kind, _, format_string = format_string.partition(" ")
         kind = kind[1:]
@@ -201,6 +201,155 @@ class StringFormatter():
             return lambda obj: fmt(conversion(obj))
 
 
+class CompiledFormatter(StringFormatter):
+    """Compile a format string into a single Python function
+
+    Produces the same results as StringFormatter, but
+    accesses fields, applies conversions, and evaluates common
+    format specifiers inline instead of calling a closure for each.
+    """
+
+    def __init__(self, format_string, default=NONE, fmt=format):
+        self.default = default
+        self.format = fmt
+        self.namespace = {"_default": default, "_fmt": fmt, "_format": format}
+
+        lines = ["def format_map(kwdict):"]
+        parts = []
+        for literal_text, field_name, format_spec, conv in \
+                _string.formatter_parser(format_string):
+            if literal_text:
+                parts.append(self._const(literal_text))
+            if field_name:
+                var = "r{}".format(len(parts))
+                self._compile_field(
+                    lines, var, field_name, format_spec, conv)
+                parts.append(var)
+
+        if len(parts) == 1 and len(lines) == 1 or not parts:
+            # literal text only
+            self.format_map = lambda _: format_string
+            return
+        if len(parts) == 1:
+            lines.append("    return " + parts[0])
+        else:
+            lines.append("    return ''.join((" + ", ".join(parts) + "))")
+
+        # bind constants as default arguments for faster local lookups
+        lines[0] = "def format_map(kwdict, {}):".format(", ".join(
+            name + "=" + name for name in self.namespace))
+        self.source = "\n".join(lines)
+        exec(compile(self.source, "<format string>", "exec"),
+             self.namespace)
+        self.format_map = self.namespace["format_map"]
+
+    def _compile_field(self, lines, var, field_name, format_spec, conversion):
+        if "|" in field_name:
+            indent = "    "
+            for field_name in field_name.split("|"):
+                if indent != "    ":
+                    lines.append(indent[4:] + "if not obj:")
+                self._compile_access(
+                    lines, indent, parse_field_name(field_name), "None")
+                indent += "    "
+            lines.append(indent[4:] + "if obj is None:")
+            lines.append(indent + "obj = _default")
+        else:
+            self._compile_access(
+                lines, "    ", parse_field_name(field_name), "_default")
+
+        if conversion:
+            lines.append("    obj = {}(obj)".format(
+                self._const(_CONVERSIONS[conversion])))
+            if format_spec:
+                self._compile_spec(lines, "    ", format_spec)
+        else:
+            self._compile_spec(lines, "    ", format_spec)
+        lines.append("    {} = obj".format(var))
+
+    def _compile_access(self, lines, indent, field, default):
+        """Generate code assigning the value of 'field' to 'obj'"""
+        key, funcs = field
+        if key in _GLOBALS or funcs or default != "_default":
+            if key in _GLOBALS:
+                access = self._const(_GLOBALS[key]) + "()"
+            else:
+                access = "kwdict[{}]".format(self._const(key))
+            lines.append(indent + "try:")
+            lines.append(indent + "    obj = " + access)
+            for func in funcs:
+                lines.append(indent + "    obj = {}(obj)".format(
+                    self._const(func)))
+            lines.append(indent + "except Exception:")
+            lines.append(indent + "    obj = " + default)
+        else:
+            key = self._const(key)
+            lines.append(indent + "obj = kwdict[{0}] if {0} in kwdict "
+                         "else _default".format(key))
+
+    def _compile_spec(self, lines, indent, format_spec):
+        """Generate code applying 'format_spec' to 'obj'"""
+        if not format_spec:
+            if self.format is format:
+                # format(obj) returns 'str' objects unchanged
+                lines.append(indent + "if obj.__class__ is not str:")
+                lines.append(indent + "    obj = _fmt(obj)")
+            else:
+                lines.append(indent + "obj = _fmt(obj)")
+            return
+
+        spec = format_spec[0]
+        if spec not in _FORMAT_SPECIFIERS:
+            lines.append(indent + "obj = _format(obj, {})".format(
+                self._const(format_spec)))
+
+        elif spec == "?":
+            before, after, format_spec = format_spec.split(_SEPARATOR, 2)
+            lines.append(indent + "if obj:")
+            self._compile_spec(lines, indent + "    ", format_spec)
+            lines.append(indent + "    obj = {} + obj + {}".format(
+                self._const(before[1:]), self._const(after)))
+            lines.append(indent + "else:")
+            lines.append(indent + "    obj = ''")
+
+        elif spec == "[" and format_spec[1] != "b":
+            indices, _, format_spec = format_spec.partition("]")
+            lines.append(indent + "obj = obj[{}]".format(
+                self._const(_slice(indices[1:]))))
+            self._compile_spec(lines, indent, format_spec)
+
+        elif spec == "L":
+            maxlen, replacement, format_spec = format_spec.split(
+                _SEPARATOR, 2)
+            self._compile_spec(lines, indent, format_spec)
+            lines.append(indent + "if len(obj) > {}:".format(
+                self._const(text.parse_int(maxlen[1:]))))
+            lines.append(indent + "    obj = " + self._const(replacement))
+
+        elif spec == "J":
+            separator, _, format_spec = format_spec.partition(_SEPARATOR)
+            lines.append(indent + "if not isinstance(obj, str):")
+            lines.append(indent + "    obj = {}.join(obj)".format(
+                self._const(separator[1:])))
+            self._compile_spec(lines, indent, format_spec)
+
+        elif spec == "R":
+            old, new, format_spec = format_spec.split(_SEPARATOR, 2)
+            lines.append(indent + "obj = obj.replace({}, {})".format(
+                self._const(old[1:]), self._const(new)))
+            self._compile_spec(lines, indent, format_spec)
+
+        else:
+            lines.append(indent + "obj = {}(obj)".format(self._const(
+                _build_format_func(format_spec, self.format))))
+
+    def _const(self, value):
+        """Add 'value' to the generated function's namespace"""
+        name = "_c{}".format(len(self.namespace))
+        self.namespace[name] = value
+        return name
+
+
 class ExpressionFormatter():
     """Generate text by evaluating a Python expression"""
 
@@ -272,6 +421,16 @@ def parse_field_name(field_name):
     return first, funcs
 
 
+def parse_fields(format_string):
+    """Return a (key, funcs) tuple for each field in 'format_string'"""
+    return [
+        parse_field_name(name)
+        for _, field_name, _, _ in _string.formatter_parser(format_string)
+        if field_name
+        for name in field_name.split("|")
+    ]
+
+
 def _slice(indices):
     start, _, stop = indices.partition(":")
     stop, _, step = stop.partition(":")
@@ -421,7 +580,8 @@ class Literal():
 
 _literal = Literal()
 
-_CACHE = {}
+_CACHE = util.LRUCache("formatter")
+_COMPILE = False
 _SEPARATOR = "/"
 _GLOBALS = {
     "_env": lambda: os.environ,
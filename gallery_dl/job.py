@@ -7,6 +7,7 @@
 # published by the Free Software Foundation.
 
 import sys
+import copy
 import errno
 import logging
 import functools
@@ -57,7 +58,7 @@ class Job():
             cfgpath.append((extr.basecategory, extr.subcategory))
 
         if cfgpath:
-            extr._cfgpath = cfgpath
+            extr._cfgpath = tuple(cfgpath)
             extr.config = extr._config_shared
             extr.config_accumulate = extr._config_shared_accumulate
 
@@ -121,7 +122,7 @@ class Job():
             extractor.sleep(sleep(), "extractor")
 
         try:
-            for msg in extractor:
+            for msg in self._messages():
                 self.dispatch(msg)
         except exception.StopExtraction as exc:
             if exc.message:
@@ -178,6 +179,10 @@ class Job():
             if self.pred_queue(url, kwdict):
                 self.handle_queue(url, kwdict)
 
+    def _messages(self):
+        """Return an iterable of messages to dispatch"""
+        return self.extractor
+
     def handle_url(self, url, kwdict):
         """Handle Message.Url"""
 
@@ -259,10 +264,134 @@ class DownloadJob(Job):
         self.sleep = None
         self.hooks = ()
         self.downloaders = {}
+        self.executor = None
+        self.pending = None
         self.out = output.select()
         self.visited = parent.visited if parent else set()
+        self.preloaded = parent.preloaded if parent else {}
         self._extractor_filter = None
         self._skipcnt = 0
+        self._dlcnt = 0
+
+    def _messages(self):
+        extr = self.extractor
+        messages = extr
+
+        depth = extr.config("prefetch")
+        if depth:
+            messages = self._messages_prefetch(messages, depth)
+
+        size = extr.config("archive-precheck")
+        if size and extr.config("archive"):
+            messages = self._messages_precheck(messages, size)
+        return messages
+
+    def _messages_prefetch(self, messages, depth):
+        """Collect up to 'depth' messages ahead in a background thread"""
+        import queue
+        import threading
+
+        buffer = queue.Queue(depth)
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=self._prefetch, args=(messages, buffer, stop),
+            daemon=True)
+        thread.start()
+
+        try:
+            while True:
+                msg = buffer.get()
+                if msg is None:
+                    return
+                if isinstance(msg, BaseException):
+                    raise msg
+                yield msg
+        finally:
+            stop.set()
+
+    @staticmethod
+    def _prefetch(messages, buffer, stop):
+        """Put all messages into 'buffer' until 'stop' is set"""
+        from queue import Full
+
+        def put(msg):
+            while not stop.is_set():
+                try:
+                    buffer.put(msg, True, 0.5)
+                    return True
+                except Full:
+                    pass
+            return False
+
+        messages = iter(messages)
+        end = None
+        try:
+            for msg in messages:
+                # copy metadata dicts, since extractors may modify
+                # and yield the same dict object multiple times
+                if msg[0] == Message.Directory:
+                    msg = (msg[0], msg[1].copy())
+                elif msg[0] == Message.Url or msg[0] == Message.Queue:
+                    msg = (msg[0], msg[1], msg[2].copy())
+                if not put(msg):
+                    return
+        except BaseException as exc:
+            # SystemExit, GeneratorExit, etc. as well,
+            # so they end the loop waiting for this thread
+            end = exc
+        finally:
+            try:
+                close = getattr(messages, "close", None)
+                if close is not None:
+                    close()
+            finally:
+                put(end)
+
+    def _messages_precheck(self, messages, size):
+        """Check the archive status of up to 'size' files at once"""
+        buffer = []
+        kwdicts = []
+
+        try:
+            for msg in messages:
+                if msg[0] == Message.Url and self.archive:
+                    # copy 'kwdict', since extractors may modify
+                    # and yield the same dict object multiple times
+                    msg = (msg[0], msg[1], msg[2].copy())
+                    kwdicts.append(msg[2])
+                elif not buffer:
+                    yield msg
+                    continue
+                buffer.append(msg)
+
+                if len(kwdicts) >= size:
+                    self._precheck_archive(kwdicts)
+                    yield from buffer
+                    buffer = []
+                    kwdicts = []
+        except Exception:
+            # dispatch all collected messages before raising,
+            # but not after KeyboardInterrupt, SystemExit, etc.
+            yield from buffer
+            raise
+
+        if kwdicts:
+            self._precheck_archive(kwdicts)
+        yield from buffer
+
+    def _precheck_archive(self, kwdicts):
+        extension_map = self.pathfmt.extension_map
+        for kwdict in kwdicts:
+            self.update_kwdict(kwdict)
+            ext = kwdict.get("extension")
+            if ext:
+                kwdict["extension"] = extension_map(ext, ext)
+
+        try:
+            self.archive.check_many(kwdicts)
+        except Exception as exc:
+            self.log.debug("Failed to check archive entries (%s: %s)",
+                           exc.__class__.__name__, exc)
 
     def handle_url(self, url, kwdict):
         """Download the resource specified in 'url'"""
@@ -277,14 +406,28 @@ class DownloadJob(Job):
             for callback in hooks["prepare"]:
                 callback(pathfmt)
 
-        if archive and archive.check(kwdict):
-            pathfmt.fix_extension()
-            self.handle_skip()
-            return
+        if archive:
+            extr = self.extractor
+            extr.archive_files += 1
+            archived = archive.check(kwdict)
+            if not archived and self.pending and \
+                    kwdict.get("_archive_key") in self.inflight:
+                # wait for the download of the same item to finish
+                self.handle_pending()
+                archived = archive.check(kwdict)
+            if archived:
+                extr.archive_hits += 1
+                pathfmt.fix_extension()
+                self.handle_skip()
+                return
 
         if pathfmt.extension and not self.metadata_http:
             pathfmt.build_path()
 
+            if self.pending and pathfmt.realpath in self.inflight:
+                # wait for the download to the same target to finish
+                self.handle_pending()
+
             if pathfmt.exists():
                 if archive:
                     archive.add(kwdict)
@@ -298,27 +441,41 @@ class DownloadJob(Job):
         if self.sleep:
             self.extractor.sleep(self.sleep(), "download")
 
-        # download from URL
-        if not self.download(url):
+        if self.executor:
+            # download in a worker thread using a copy of the current state
+            pathfmt = copy.copy(pathfmt)
+            pathfmt.kwdict = kwdict = kwdict.copy()
+            if "check_file" in pathfmt.__dict__:
+                pathfmt.check_file = pathfmt._enum_file
+            future = self.executor.submit(
+                self._download_thread, url, kwdict, pathfmt)
+            self.pending.append((future, url, kwdict, pathfmt))
+            if pathfmt.extension:
+                self.inflight.add(pathfmt.realpath)
+            if "_archive_key" in kwdict:
+                self.inflight.add(kwdict["_archive_key"])
+            self.handle_pending(self.workers)
+            return
 
-            # use fallback URLs if available/enabled
-            fallback = kwdict.get("_fallback", ()) if self.fallback else ()
-            for num, url in enumerate(fallback, 1):
-                util.remove_file(pathfmt.temppath)
-                self.log.info("Trying fallback URL #%d", num)
-                if self.download(url):
-                    break
-            else:
-                # download failed
-                self.status |= 4
-                self.log.error("Failed to download %s",
-                               pathfmt.filename or url)
-                return
+        self.handle_download(
+            self._download(url, kwdict, pathfmt), url, kwdict, pathfmt)
+
+    def handle_download(self, success, url, kwdict, pathfmt):
+        """Process the result of a file download"""
+        hooks = self.hooks
+        archive = self.archive
+
+        if not success:
+            # download failed
+            self.status |= 4
+            self.log.error("Failed to download %s",
+                           pathfmt.filename or url)
+            return
 
         if not pathfmt.temppath:
             if archive:
                 archive.add(kwdict)
-            self.handle_skip()
+            self.handle_skip(pathfmt)
             return
 
         # run post processors
@@ -330,14 +487,31 @@ class DownloadJob(Job):
         pathfmt.finalize()
         self.out.success(pathfmt.path)
         self._skipcnt = 0
+        self._dlcnt += 1
         if archive:
             archive.add(kwdict)
         if "after" in hooks:
             for callback in hooks["after"]:
                 callback(pathfmt)
 
+    def handle_pending(self, limit=0):
+        """Process results of concurrent downloads in submission order
+
+        Blocks until at most 'limit' downloads are still pending.
+        """
+        pending = self.pending
+        while pending:
+            if len(pending) <= limit and not pending[0][0].done():
+                break
+            future, url, kwdict, pathfmt = pending.popleft()
+            self.inflight.discard(pathfmt.realpath)
+            self.inflight.discard(kwdict.get("_archive_key"))
+            self.handle_download(future.result(), url, kwdict, pathfmt)
+
     def handle_directory(self, kwdict):
         """Set and create the target directory for downloads"""
+        if self.pending:
+            self.handle_pending()
         if not self.pathfmt:
             self.initialize(kwdict)
         else:
@@ -351,8 +525,14 @@ class DownloadJob(Job):
 
     def handle_queue(self, url, kwdict):
         if url in self.visited:
+            if self.extractor.archive_stop:
+                # count as archived file for 'archive-stop'
+                self.extractor.archive_files += 1
+                self.extractor.archive_hits += 1
             return
         self.visited.add(url)
+        if self.pending:
+            self.handle_pending()
 
         cls = kwdict.get("_extractor")
         if cls:
@@ -415,12 +595,26 @@ class DownloadJob(Job):
                 except exception.RestartExtraction:
                     pass
 
+            if pextr.archive_stop:
+                # queue URLs without new downloads count as archived files
+                pextr.archive_files += 1
+                if not status and not job._dlcnt:
+                    pextr.archive_hits += 1
+
         else:
             self._write_unsupported(url)
 
     def handle_finalize(self):
+        if self.executor:
+            self.finalize_downloads()
+
         if self.archive:
-            self.archive.close()
+            try:
+                self.archive.close()
+            except Exception as exc:
+                self.log.warning(
+                    "Failed to write download archive (%s: %s)",
+                    exc.__class__.__name__, exc)
 
         pathfmt = self.pathfmt
         if pathfmt:
@@ -443,8 +637,12 @@ class DownloadJob(Job):
                     for callback in hooks["finalize-success"]:
                         callback(pathfmt)
 
-    def handle_skip(self):
-        pathfmt = self.pathfmt
+    def handle_skip(self, pathfmt=None):
+        if pathfmt is None:
+            pathfmt = self.pathfmt
+            if self.pending and self._skipexc:
+                # let earlier downloads reset '_skipcnt' first
+                self.handle_pending()
         self.out.skip(pathfmt.path)
         if "skip" in self.hooks:
             for callback in self.hooks["skip"]:
@@ -454,13 +652,41 @@ class DownloadJob(Job):
             if self._skipcnt >= self._skipmax:
                 raise self._skipexc()
 
-    def download(self, url):
+    def finalize_downloads(self):
+        """Wait for all concurrent downloads and process their results"""
+        # extraction is already over; do not abort on consecutive skips
+        self._skipexc = None
+        # do not wait for downloads after Ctrl+C, SystemExit, etc.
+        exc_type = sys.exc_info()[0]
+        interrupted = exc_type is not None and \
+            not issubclass(exc_type, Exception)
+        try:
+            if not interrupted:
+                self.handle_pending()
+        except Exception as exc:
+            self.log.error("%s: %s", exc.__class__.__name__, exc)
+            self.log.debug("", exc_info=True)
+            self.status |= 1
+        except BaseException:
+            interrupted = True
+            raise
+        finally:
+            if interrupted:
+                for future, _, _, _ in self.pending:
+                    future.cancel()
+            self.pending.clear()
+            self.inflight.clear()
+            self.executor.shutdown(not interrupted)
+
+    def download(self, url, pathfmt=None, downloaders=None):
         """Download 'url'"""
+        if pathfmt is None:
+            pathfmt = self.pathfmt
         scheme = url.partition(":")[0]
-        downloader = self.get_downloader(scheme)
+        downloader = self.get_downloader(scheme, downloaders)
         if downloader:
             try:
-                return downloader.download(url, self.pathfmt)
+                return downloader.download(url, pathfmt)
             except OSError as exc:
                 if exc.errno == errno.ENOSPC:
                     raise
@@ -469,10 +695,35 @@ class DownloadJob(Job):
         self._write_unsupported(url)
         return False
 
-    def get_downloader(self, scheme):
+    def _download(self, url, kwdict, pathfmt, downloaders=None):
+        """Download 'url' or one of its fallback URLs"""
+        if self.download(url, pathfmt, downloaders):
+            return True
+
+        # use fallback URLs if available/enabled
+        fallback = kwdict.get("_fallback", ()) if self.fallback else ()
+        for num, url in enumerate(fallback, 1):
+            util.remove_file(pathfmt.temppath)
+            self.log.info("Trying fallback URL #%d", num)
+            if self.download(url, pathfmt, downloaders):
+                return True
+        return False
+
+    def _download_thread(self, url, kwdict, pathfmt):
+        # each worker thread uses its own downloader instances
+        local = self._local
+        try:
+            downloaders = local.downloaders
+        except AttributeError:
+            downloaders = local.downloaders = {}
+        return self._download(url, kwdict, pathfmt, downloaders)
+
+    def get_downloader(self, scheme, downloaders=None):
         """Return a downloader suitable for 'scheme'"""
+        if downloaders is None:
+            downloaders = self.downloaders
         try:
-            return self.downloaders[scheme]
+            return downloaders[scheme]
         except KeyError:
             pass
 
@@ -484,9 +735,9 @@ class DownloadJob(Job):
             self.log.error("'%s:' URLs are not supported/enabled", scheme)
 
         if cls and cls.scheme == "http":
-            self.downloaders["http"] = self.downloaders["https"] = instance
+            downloaders["http"] = downloaders["https"] = instance
         else:
-            self.downloaders[scheme] = instance
+            downloaders[scheme] = instance
         return instance
 
     def initialize(self, kwdict=None):
@@ -502,19 +753,35 @@ class DownloadJob(Job):
         self.fallback = cfg("fallback", True)
         if not cfg("download", True):
             # monkey-patch method to do nothing and always return True
-            self.download = pathfmt.fix_extension
+            self.download = lambda url, pathfmt=None, downloaders=None: \
+                (pathfmt or self.pathfmt).fix_extension()
+        else:
+            workers = cfg("downloads-concurrent", 1)
+            if workers > 1:
+                import threading
+                from concurrent.futures import ThreadPoolExecutor
+                self.workers = workers
+                self.executor = ThreadPoolExecutor(workers)
+                self.pending = collections.deque()
+                # target paths and archive keys of pending downloads
+                self.inflight = set()
+                self._local = threading.local()
+                extr.log.debug("Using %d concurrent downloads", workers)
 
         archive = cfg("archive")
         if archive:
             archive = util.expand_path(archive)
-            archive_format = (cfg("archive-prefix", extr.category) +
+            archive_prefix = cfg("archive-prefix", extr.category)
+            archive_format = (archive_prefix +
                               cfg("archive-format", extr.archive_fmt))
             archive_pragma = (cfg("archive-pragma"))
             try:
                 if "{" in archive:
                     archive = formatter.parse(archive).format_map(kwdict)
                 self.archive = util.DownloadArchive(
-                    archive, archive_format, archive_pragma)
+                    archive, archive_format, archive_pragma,
+                    batch=cfg("archive-batch"),
+                    interval=cfg("archive-batch-interval"))
             except Exception as exc:
                 extr.log.warning(
                     "Failed to open download archive at '%s' ('%s: %s')",
@@ -522,6 +789,16 @@ class DownloadJob(Job):
             else:
                 extr.log.debug("Using download archive '%s'", archive)
 
+                stop = cfg("archive-stop")
+                if stop:
+                    extr.archive_stop = 1 if stop is True else stop
+
+                preload = cfg("archive-preload")
+                if preload:
+                    self._preload_archive(
+                        archive, archive_prefix, kwdict,
+                        128 if preload is True else preload)
+
         skip = cfg("skip", True)
         if skip:
             self._skipexc = None
@@ -591,6 +868,39 @@ class DownloadJob(Job):
                     for callback in self.hooks["init"]:
                         callback(pathfmt)
 
+    def _preload_archive(self, path, prefix, kwdict, limit):
+        log = self.extractor.log
+        try:
+            prefix = formatter.parse(prefix).format_map(kwdict or {})
+        except Exception:
+            prefix = ""
+
+        # reuse entries already loaded by a parent or sibling job
+        archive = self.archive
+        key = (path, prefix)
+        if key in self.preloaded:
+            entries = self.preloaded[key]
+            if entries is not None:
+                archive.prefix = prefix
+                archive.entries = entries
+                log.debug("Using %s preloaded download archive entries",
+                          len(entries))
+            return
+
+        try:
+            num = archive.preload(prefix, limit)
+        except Exception as exc:
+            log.warning("Failed to preload download archive (%s: %s)",
+                        exc.__class__.__name__, exc)
+            return
+        self.preloaded[key] = archive.entries
+
+        if num is None:
+            log.debug("Download archive entries exceed preload limit "
+                      "of %s MiB", limit)
+        else:
+            log.debug("Preloaded %s download archive entries", num)
+
     def register_hooks(self, hooks, options=None):
         expr = options.get("filter") if options else None
 
@@ -808,6 +1118,7 @@ class DataJob(Job):
         Job.__init__(self, url, parent)
         self.file = file
         self.data = []
+        self.add = self.data.append
         self.ascii = config.get(("output",), "ascii", ensure_ascii)
 
         private = config.get(("output",), "private")
@@ -822,6 +1133,20 @@ class DataJob(Job):
         if sleep:
             extractor.sleep(sleep(), "extractor")
 
+        num_to_str = config.get(("output",), "num-to-str", False)
+        lines = config.get(("output",), "json-lines", False)
+        if lines:
+            # write each message as soon as it is available
+            self.add = self._write_line
+            self._num_to_str = num_to_str
+            self._encode = util.json_encoder(
+                ensure_ascii=self.ascii,
+                sort_keys=True,
+                separators=(",", ":"),
+            )
+        else:
+            self.add = self.data.append
+
         # collect data
         try:
             for msg in extractor:
@@ -829,12 +1154,15 @@ class DataJob(Job):
         except exception.StopExtraction:
             pass
         except Exception as exc:
-            self.data.append((exc.__class__.__name__, str(exc)))
+            self.add((exc.__class__.__name__, str(exc)))
         except BaseException:
             pass
 
+        if lines:
+            return 0
+
         # convert numbers to string
-        if config.get(("output",), "num-to-str", False):
+        if num_to_str:
             for msg in self.data:
                 util.transform_dict(msg[-1], util.number_to_string)
 
@@ -847,11 +1175,27 @@ class DataJob(Job):
 
         return 0
 
+    def _write_line(self, msg):
+        if self._num_to_str and isinstance(msg[-1], dict):
+            # the extractor might still use nested dicts of 'msg'
+            msg = msg[:-1] + (self._numbers_to_string(msg[-1]),)
+        self.file.write(self._encode(msg) + "\n")
+        self.file.flush()
+
+    def _numbers_to_string(self, kwdict):
+        """Return a copy of 'kwdict' with all numbers converted to string"""
+        return {
+            key: (self._numbers_to_string(value)
+                  if isinstance(value, dict) else
+                  util.number_to_string(value))
+            for key, value in kwdict.items()
+        }
+
     def handle_url(self, url, kwdict):
-        self.data.append((Message.Url, url, self.filter(kwdict)))
+        self.add((Message.Url, url, self.filter(kwdict)))
 
     def handle_directory(self, kwdict):
-        self.data.append((Message.Directory, self.filter(kwdict)))
+        self.add((Message.Directory, self.filter(kwdict)))
 
     def handle_queue(self, url, kwdict):
-        self.data.append((Message.Queue, url, self.filter(kwdict)))
+        self.add((Message.Queue, url, self.filter(kwdict)))
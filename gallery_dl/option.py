@@ -142,12 +142,23 @@ def build_parser():
         dest="user-agent", metavar="UA", action=ConfigAction,
         help="User-Agent request header",
     )
+    general.add_argument(
+        "--jobs",
+        dest="jobs-concurrent", metavar="N", type=int, action=ConfigAction,
+        help="Number of input URLs to process in parallel (default: 1)",
+    )
     general.add_argument(
         "--clear-cache",
         dest="clear_cache", metavar="MODULE",
         help="Delete cached login sessions, cookies, etc. for MODULE "
              "(ALL to delete everything)",
     )
+    general.add_argument(
+        "--cache-info",
+        dest="cache_info", action="store_true",
+        help="Print location, size, and number of entries "
+             "of the cache database",
+    )
 
     output = parser.add_argument_group("Output Options")
     output.add_argument(
@@ -177,6 +188,12 @@ def build_parser():
         dest="jobtype", action="store_const", const=job.DataJob,
         help="Print JSON information",
     )
+    output.add_argument(
+        "--json-lines",
+        dest="json_lines", action="store_true",
+        help="Print JSON information as one line per message "
+             "while extracting",
+    )
     output.add_argument(
         "-s", "--simulate",
         dest="jobtype", action="store_const", const=job.SimulationJob,
@@ -430,6 +447,34 @@ def build_parser():
               "and other delegated URLs"),
     )
 
+    archive = parser.add_argument_group("Download Archive Options")
+    archive.add_argument(
+        "--archive-stats",
+        dest="archive_stats", metavar="FILE",
+        help="Print the number of entries per category in archive FILE",
+    )
+    archive.add_argument(
+        "--archive-export",
+        dest="archive_export", metavar="FILE",
+        help="Write all entries of archive FILE to stdout, one per line",
+    )
+    archive.add_argument(
+        "--archive-import",
+        dest="archive_import", metavar="FILE",
+        help="Add entries read line by line from stdin to archive FILE",
+    )
+    archive.add_argument(
+        "--archive-merge",
+        dest="archive_merge", metavar="FILE", nargs="+",
+        help=("Add all entries of the archives given as "
+              "second, third, etc. FILE to the first"),
+    )
+    archive.add_argument(
+        "--archive-vacuum",
+        dest="archive_vacuum", metavar="FILE",
+        help="Rebuild archive FILE to reduce its size",
+    )
+
     infojson = {
         "name"    : "metadata",
         "event"   : "init",
@@ -11,10 +11,13 @@
 import os
 import re
 import shutil
+import datetime
 import functools
 from . import util, formatter, exception
 
 WINDOWS = util.WINDOWS
+SCALAR_TYPES = {str, int, bool, type(None), type(util.SENTINEL),
+                datetime.date, datetime.datetime}
 EXTENSION_MAP = {
     "jpeg": "jpg",
     "jpe" : "jpg",
@@ -72,6 +75,10 @@ class PathFormat():
         except Exception as exc:
             raise exception.DirectoryFormatError(exc)
 
+        if "directory_conditions" not in self.__dict__:
+            self.directory_fields = self._build_directory_fields(
+                directory_fmt)
+
         self.kwdict = {}
         self.delete = False
         self.prefix = ""
@@ -117,6 +124,10 @@ class PathFormat():
         if WINDOWS:
             self.extended = config("path-extended", True)
 
+        if config("listing-cache"):
+            self.listings = {}
+            self._exists = self._exists_listing
+
         basedir = extractor._parentdir
         if not basedir:
             basedir = config("base-directory")
@@ -158,7 +169,7 @@ class PathFormat():
 
     def exists(self):
         """Return True if the file exists on disk"""
-        if self.extension and os.path.exists(self.realpath):
+        if self.extension and self._exists(self.realpath):
             return self.check_file()
         return False
 
@@ -168,21 +179,90 @@ class PathFormat():
 
     def _enum_file(self):
         num = 1
-        try:
-            while True:
-                prefix = format(num) + "."
-                self.kwdict["extension"] = prefix + self.extension
-                self.build_path()
-                os.stat(self.realpath)  # raises OSError if file doesn't exist
-                num += 1
-        except OSError:
-            pass
+        exists = self._exists
+        while True:
+            prefix = format(num) + "."
+            self.kwdict["extension"] = prefix + self.extension
+            self.build_path()
+            if not exists(self.realpath):
+                break
+            num += 1
         self.prefix = prefix
         return False
 
+    _exists = staticmethod(os.path.exists)
+    listings = None
+
+    def _exists_listing(self, path):
+        """Check for 'path' in a cached listing of its directory"""
+        directory, name = os.path.split(path)
+        try:
+            listing = self.listings[directory]
+        except KeyError:
+            try:
+                listing = set(map(os.path.normcase, os.listdir(directory)))
+            except OSError:
+                listing = set()
+            self.listings[directory] = listing
+        return os.path.normcase(name) in listing
+
+    def _listing_add(self, path):
+        directory, name = os.path.split(path)
+        listing = self.listings.get(directory)
+        if listing is not None:
+            listing.add(os.path.normcase(name))
+
+    @staticmethod
+    def _build_directory_fields(directory_fmt):
+        """Collect all fields used by regular directory format strings"""
+        fields = []
+        for dirfmt in directory_fmt:
+            if dirfmt.startswith("\f"):
+                return None
+            for key, funcs in formatter.parse_fields(dirfmt):
+                if key == "_lit":
+                    continue
+                if key in formatter._GLOBALS:
+                    return None
+                fields.append((key, funcs))
+        return fields
+
+    def _directory_key(self, kwdict):
+        """Return the values of all directory fields in 'kwdict'
+
+        Returns None if any of them is not an immutable scalar value
+        and could therefore change without being detected.
+        """
+        values = []
+        for key, funcs in self.directory_fields:
+            try:
+                obj = kwdict[key]
+                for func in funcs:
+                    obj = func(obj)
+            except Exception:
+                obj = util.SENTINEL
+            cls = obj.__class__
+            if cls not in SCALAR_TYPES or \
+                    cls is datetime.datetime and obj.tzinfo is not None:
+                return None
+            values.append((cls, obj))
+        return values
+
+    directory_fields = None
+    directory_key = None
+
     def set_directory(self, kwdict):
         """Build directory path and create it if necessary"""
         self.kwdict = kwdict
+
+        fields = self.directory_fields
+        if fields is not None:
+            key = self._directory_key(kwdict)
+            if key is not None and key == self.directory_key:
+                # all directory format fields are unchanged
+                return
+            self.directory_key = None
+
         sep = os.sep
 
         segments = self.build_directory(kwdict)
@@ -205,6 +285,8 @@ class PathFormat():
                 directory += sep
 
         self.realdirectory = directory
+        if fields is not None:
+            self.directory_key = key
 
     def set_filename(self, kwdict):
         """Set general filename data"""
@@ -346,6 +428,9 @@ class PathFormat():
                     os.unlink(self.temppath)
                 break
 
+        if self.listings is not None:
+            self._listing_add(self.realpath)
+
         mtime = self.kwdict.get("_mtime")
         if mtime:
             util.set_mtime(self.realpath, mtime)
@@ -38,14 +38,26 @@ class PostProcessor():
                 self.archive = util.DownloadArchive(
                     archive, archive_format,
                     options.get("archive-pragma"),
-                    "_archive_" + self.name)
+                    "_archive_" + self.name,
+                    options.get("archive-batch"),
+                    options.get("archive-batch-interval"))
             except Exception as exc:
                 self.log.warning(
                     "Failed to open %s archive at '%s' ('%s: %s')",
                     self.name, archive, exc.__class__.__name__, exc)
             else:
                 self.log.debug("Using %s archive '%s'", self.name, archive)
+                if self.archive.batch:
+                    job.hooks["finalize"].append(self._flush_archive)
                 return True
         else:
             self.archive = None
         return False
+
+    def _flush_archive(self, pathfmt):
+        try:
+            self.archive.flush()
+        except Exception as exc:
+            self.log.warning(
+                "Failed to write %s archive (%s: %s)",
+                self.name, exc.__class__.__name__, exc)
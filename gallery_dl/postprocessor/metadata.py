@@ -10,7 +10,7 @@
 
 from .common import PostProcessor
 from .. import util, formatter
-import json
+import sqlite3
 import sys
 import os
 
@@ -24,6 +24,7 @@ class MetadataPP(PostProcessor):
         cfmt = options.get("content-format") or options.get("format")
         omode = "w"
         filename = None
+        batch = 0
 
         if mode == "tags":
             self.write = self._write_tags
@@ -47,12 +48,18 @@ class MetadataPP(PostProcessor):
             ext = "txt"
         elif mode == "jsonl":
             self.write = self._write_json
-            self._json_encode = self._make_encoder(options).encode
+            self._json_encode = self._make_encoder(options, None, (",", ":"))
             omode = "a"
             filename = "data.jsonl"
+            self._write_batch = self._write_batch_jsonl
+        elif mode == "sqlite":
+            self._json_encode = self._make_encoder(options, None, (",", ":"))
+            filename = "metadata.sqlite3"
+            batch = 100
+            self._write_batch = self._write_batch_sqlite
         else:
             self.write = self._write_json
-            self._json_encode = self._make_encoder(options, 4).encode
+            self._json_encode = self._make_encoder(options, 4)
             ext = "json"
 
         directory = options.get("directory")
@@ -75,12 +82,27 @@ class MetadataPP(PostProcessor):
         else:
             self.extension = options.get("extension", ext)
 
+        batch = options.get("batch", batch)
+        if mode == "sqlite":
+            # there is no unbatched way of writing to a database
+            batch = max(batch or 1, 1)
+        if batch and hasattr(self, "_write_batch"):
+            # collect records and write them all at once
+            self.run = self._run_batch
+            self.batch = batch
+            self.buffer = {}
+            self.count = 0
+            self.archived = []
+
         events = options.get("event")
         if events is None:
             events = ("file",)
         elif isinstance(events, str):
             events = events.split(",")
         job.register_hooks({event: self.run for event in events}, options)
+        if self.run == self._run_batch:
+            # after 'run' for "finalize" events, independent of 'filter'
+            job.register_hooks({"finalize": self._flush_batch})
 
         self._init_archive(job, options, "_MD_")
         self.mtime = options.get("mtime")
@@ -116,6 +138,72 @@ class MetadataPP(PostProcessor):
             if mtime:
                 util.set_mtime(path, mtime)
 
+    def _run_batch(self, pathfmt):
+        kwdict = pathfmt.kwdict
+        archive = self.archive
+        if archive:
+            if archive.check(kwdict):
+                return
+            # copy to preserve the archive key until the next flush
+            self.archived.append(kwdict.copy())
+
+        path = self._directory(pathfmt) + self._filename(pathfmt)
+        if not self.private:
+            kwdict = util.filter_dict(kwdict)
+        record = self._json_encode(kwdict)
+
+        try:
+            self.buffer[path].append((pathfmt.realpath, record))
+        except KeyError:
+            self.buffer[path] = [(pathfmt.realpath, record)]
+
+        self.count += 1
+        if self.count >= self.batch:
+            self._flush_batch()
+
+    def _flush_batch(self, pathfmt=None):
+        buffer = self.buffer
+        if not buffer:
+            return
+        archived = self.archived
+        self.buffer = {}
+        self.archived = []
+        self.count = 0
+
+        success = True
+        for path, records in buffer.items():
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                self._write_batch(path, records)
+            except Exception as exc:
+                self.log.warning(
+                    "Failed to write %s metadata record(s) to '%s' (%s: %s)",
+                    len(records), path, exc.__class__.__name__, exc)
+                success = False
+
+        archive = self.archive
+        if archive and success:
+            for kwdict in archived:
+                archive.add(kwdict)
+
+    def _write_batch_jsonl(self, path, records):
+        with open(path, self.omode, encoding=self.encoding) as fp:
+            fp.write("".join([record + "\n" for _, record in records]))
+
+    def _write_batch_sqlite(self, path, records):
+        db = sqlite3.connect(path, timeout=60)
+        try:
+            with db:
+                db.execute(
+                    "CREATE TABLE IF NOT EXISTS metadata ("
+                    "id INTEGER PRIMARY KEY AUTOINCREMENT, "
+                    "path TEXT, data TEXT)")
+                db.executemany(
+                    "INSERT INTO metadata (path, data) VALUES (?,?)",
+                    records)
+        finally:
+            db.close()
+
     def _run_stdout(self, pathfmt):
         self.write(sys.stdout, pathfmt.kwdict)
 
@@ -200,13 +288,13 @@ class MetadataPP(PostProcessor):
         fp.write(self._json_encode(kwdict) + "\n")
 
     @staticmethod
-    def _make_encoder(options, indent=None):
-        return json.JSONEncoder(
+    def _make_encoder(options, indent=None, separators=None):
+        return util.json_encoder(
             ensure_ascii=options.get("ascii", False),
             sort_keys=options.get("sort", False),
-            separators=options.get("separators"),
+            separators=options.get("separators", separators),
             indent=options.get("indent", indent),
-            check_circular=False, default=str,
+            check_circular=False,
         )
 
 
@@ -0,0 +1,229 @@
+# -*- coding: utf-8 -*-
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+
+"""Alternative transport adapters for 'requests' sessions"""
+
+import ssl
+import socket
+import http.client
+import requests
+from requests import certs, exceptions
+from requests.adapters import BaseAdapter
+from requests.cookies import extract_cookies_to_jar
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers, select_proxy
+import httpcore
+import httpx
+
+# connection-specific headers not allowed in HTTP/2 requests
+HOP_BY_HOP_HEADERS = frozenset((
+    "connection", "keep-alive", "proxy-connection",
+    "transfer-encoding", "upgrade",
+))
+
+
+class HttpxAdapter(BaseAdapter):
+    """Send requests with 'httpx', using HTTP/2 when supported by a server
+
+    Requests, responses, and errors get converted from and to their
+    'requests' equivalents, so that retries, redirects, proxies, and cookies
+    are handled by a 'requests.Session' as usual.
+    """
+
+    def __init__(self, ssl_options=0, ssl_ciphers=None, source_address=None,
+                 pool_maxsize=10, idle_timeout=None, http2=True):
+        if http2:
+            # fail here instead of on the first request,
+            # so that callers can fall back to another adapter
+            import h2  # noqa F401
+        BaseAdapter.__init__(self)
+        self.ssl_options = ssl_options
+        self.ssl_ciphers = ssl_ciphers
+        self.source_address = source_address
+        self.limits = httpx.Limits(
+            max_connections=None,
+            max_keepalive_connections=pool_maxsize,
+            keepalive_expiry=idle_timeout or 5.0,
+        )
+        self.http2 = http2
+        self.clients = {}
+
+    def send(self, request, stream=False, timeout=None, verify=True,
+             cert=None, proxies=None):
+        client = self._client(select_proxy(request.url, proxies), verify, cert)
+
+        if isinstance(timeout, tuple):
+            connect, read = timeout
+            timeout = httpx.Timeout(read, connect=connect)
+        else:
+            timeout = httpx.Timeout(timeout)
+
+        headers = [
+            (key, value)
+            for key, value in request.headers.items()
+            if key.lower() not in HOP_BY_HOP_HEADERS
+        ]
+        req = httpx.Request(
+            request.method, request.url,
+            headers=headers, content=request.body,
+            extensions={"timeout": timeout.as_dict()},
+        )
+
+        try:
+            resp = client.send(req, stream=True)
+        except httpx.TimeoutException as exc:
+            if isinstance(exc, httpx.ConnectTimeout):
+                raise exceptions.ConnectTimeout(exc, request=request)
+            raise exceptions.ReadTimeout(exc, request=request)
+        except httpx.ProxyError as exc:
+            raise exceptions.ProxyError(exc, request=request)
+        except httpx.UnsupportedProtocol as exc:
+            raise exceptions.InvalidSchema(exc, request=request)
+        except httpx.TransportError as exc:
+            if isinstance(exc.__context__, ssl.SSLError):
+                raise exceptions.SSLError(exc, request=request)
+            raise exceptions.ConnectionError(exc, request=request)
+
+        return self.build_response(request, resp)
+
+    def build_response(self, request, resp):
+        """Create a 'requests.Response' object from an httpx response"""
+        response = requests.Response()
+        response.status_code = resp.status_code
+        response.headers = CaseInsensitiveDict(resp.headers.items())
+        response.encoding = get_encoding_from_headers(response.headers)
+        response.reason = resp.reason_phrase
+        response.raw = HttpxRaw(resp)
+        response.url = request.url
+        response.request = request
+        response.connection = self
+        extract_cookies_to_jar(response.cookies, request, response.raw)
+        return response
+
+    def close(self):
+        for client in self.clients.values():
+            client.close()
+        self.clients.clear()
+
+    def _client(self, proxy, verify, cert):
+        key = (proxy, verify, cert)
+        try:
+            return self.clients[key]
+        except KeyError:
+            pass
+
+        if isinstance(verify, str):
+            ssl_context = ssl.create_default_context(cafile=verify)
+        else:
+            # same CA bundle as 'requests' instead of the system's
+            ssl_context = ssl.create_default_context(cafile=certs.where())
+            if not verify:
+                ssl_context.check_hostname = False
+                ssl_context.verify_mode = ssl.CERT_NONE
+        if self.ssl_options:
+            ssl_context.options |= self.ssl_options
+        if self.ssl_ciphers:
+            ssl_context.set_ecdh_curve("prime256v1")
+            ssl_context.set_ciphers(self.ssl_ciphers)
+        if cert:
+            if isinstance(cert, str):
+                ssl_context.load_cert_chain(cert)
+            else:
+                ssl_context.load_cert_chain(*cert)
+
+        source_address = self.source_address
+        transport = httpx.HTTPTransport(
+            verify=ssl_context,
+            http2=self.http2,
+            limits=self.limits,
+            proxy=proxy,
+            local_address=source_address[0] if source_address else None,
+        )
+        if source_address and source_address[1]:
+            # httpcore only binds to a host address and always uses port 0
+            transport._pool._network_backend = SourceAddressBackend(
+                source_address)
+        client = self.clients[key] = httpx.Client(
+            transport=transport, trust_env=False)
+        return client
+
+
+class SourceAddressBackend(httpcore.SyncBackend):
+    """Network backend binding TCP connections to host *and* port"""
+
+    def __init__(self, source_address):
+        self.source_address = source_address
+
+    def connect_tcp(self, host, port, timeout=None, local_address=None,
+                    socket_options=None):
+        from httpcore._backends.sync import SyncStream
+
+        try:
+            sock = socket.create_connection(
+                (host, port), timeout, source_address=self.source_address)
+        except socket.timeout as exc:
+            raise httpcore.ConnectTimeout(exc)
+        except OSError as exc:
+            raise httpcore.ConnectError(exc)
+        for option in socket_options or ():
+            sock.setsockopt(*option)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        return SyncStream(sock)
+
+
+class HttpxRaw():
+    """File-like wrapper around a streamed httpx response
+
+    Provides everything 'requests.Response' and
+    the 'http' downloader access on 'response.raw'.
+    """
+
+    def __init__(self, response):
+        self.response = response
+        self.chunked = (response.headers.get("transfer-encoding", "")
+                        .lower() == "chunked")
+        self.buffer = b""
+        self.content = response.iter_bytes()
+
+        # used by 'extract_cookies_to_jar()'
+        msg = http.client.HTTPMessage()
+        for key, value in response.headers.multi_items():
+            msg[key] = value
+        self._original_response = self
+        self.msg = msg
+
+    def read(self, amt=None):
+        buffer = self.buffer
+        try:
+            while amt is None or len(buffer) < amt:
+                chunk = next(self.content, None)
+                if chunk is None:
+                    break
+                buffer += chunk
+        except httpx.TimeoutException as exc:
+            raise exceptions.ConnectionError(exc)
+        except httpx.DecodingError as exc:
+            raise exceptions.ContentDecodingError(exc)
+        except (httpx.TransportError, httpx.StreamError) as exc:
+            raise exceptions.ChunkedEncodingError(exc)
+
+        if amt is None:
+            self.buffer = b""
+            return buffer
+        self.buffer = buffer[amt:]
+        return buffer[:amt]
+
+    def stream(self, amt=65536, decode_content=None):
+        while True:
+            data = self.read(amt)
+            if not data:
+                return
+            yield data
+
+    def close(self):
+        self.response.close()
+
+    release_conn = close
@@ -14,12 +14,16 @@ import sys
 import json
 import time
 import random
+import weakref
 import hashlib
 import sqlite3
 import binascii
 import datetime
 import functools
+import codecs
 import itertools
+import threading
+import collections
 import subprocess
 import urllib.parse
 from http.cookiejar import Cookie
@@ -227,15 +231,93 @@ json_loads = json._default_decoder.decode
 json_dumps = json.JSONEncoder(default=str).encode
 
 
-def dump_json(obj, fp=sys.stdout, ensure_ascii=True, indent=4):
-    """Serialize 'obj' as JSON and write it to 'fp'"""
-    json.dump(
-        obj, fp,
+def json_encoder(ensure_ascii=True, indent=None, sort_keys=False,
+                 separators=None, check_circular=True):
+    """Return a function serializing an object as JSON string
+
+    Uses 'orjson' when it is installed and able to produce
+    the requested output format, and the 'json' module otherwise.
+    """
+    encode = json.JSONEncoder(
         ensure_ascii=ensure_ascii,
         indent=indent,
+        sort_keys=sort_keys,
+        separators=separators,
+        check_circular=check_circular,
         default=str,
-        sort_keys=True,
-    )
+    ).encode
+
+    if JSON_ENCODER == "json":
+        return encode
+    try:
+        import orjson
+    except ImportError:
+        return encode
+
+    if separators:
+        separators = tuple(separators)
+    if indent is None:
+        if separators != (",", ":"):
+            return encode
+        option = 0
+    elif indent.__class__ is int and indent >= 0 and \
+            separators in (None, (",", ": ")):
+        option = orjson.OPT_INDENT_2
+    else:
+        return encode
+
+    reindent = option and indent != 2
+    option |= (orjson.OPT_NON_STR_KEYS |
+               orjson.OPT_PASSTHROUGH_DATETIME |
+               orjson.OPT_PASSTHROUGH_DATACLASS)
+    if sort_keys:
+        option |= orjson.OPT_SORT_KEYS
+    dumps = orjson.dumps
+
+    def encode_fast(obj):
+        try:
+            data = dumps(obj, str, option).decode()
+        except TypeError:
+            # integers beyond 64 bit, surrogates, etc.
+            return encode(obj)
+        if reindent:
+            data = _reindent(data, indent)
+        if ensure_ascii:
+            if "\x7f" in data:
+                data = data.replace("\x7f", "\\u007f")
+            if not data.isascii():
+                data = data.encode("ascii", "gallery_dl.json").decode()
+        return data
+
+    return encode_fast
+
+
+def _reindent(data, indent):
+    """Change the indentation of orjson's OPT_INDENT_2 output to 'indent'
+
+    Its lines only start with spaces as indentation,
+    since line breaks in strings are always escaped.
+    """
+    lines = data.split("\n")
+    for num, line in enumerate(lines):
+        if line[0] == " ":
+            stripped = line.lstrip(" ")
+            lines[num] = " " * (
+                (len(line) - len(stripped)) // 2 * indent) + stripped
+    return "\n".join(lines)
+
+
+def _escape_nonascii(exc, escape=json.encoder.encode_basestring_ascii):
+    """Codec error handler replacing characters with JSON escapes"""
+    return escape(exc.object[exc.start:exc.end])[1:-1], exc.end
+
+
+codecs.register_error("gallery_dl.json", _escape_nonascii)
+
+
+def dump_json(obj, fp=sys.stdout, ensure_ascii=True, indent=4):
+    """Serialize 'obj' as JSON and write it to 'fp'"""
+    fp.write(json_encoder(ensure_ascii, indent, True)(obj))
     fp.write("\n")
 
 
@@ -345,6 +427,15 @@ def expand_path(path):
     return os.path.expandvars(os.path.expanduser(path))
 
 
+def cache_directory():
+    """Return the path of gallery-dl's cache directory"""
+    if WINDOWS:
+        cachedir = os.environ.get("APPDATA", "~")
+    else:
+        cachedir = os.environ.get("XDG_CACHE_HOME", "~/.cache")
+    return expand_path(os.path.join(cachedir, "gallery-dl"))
+
+
 def remove_file(path):
     try:
         os.unlink(path)
@@ -601,6 +692,7 @@ EPOCH = datetime.datetime(1970, 1, 1)
 SECOND = datetime.timedelta(0, 1)
 WINDOWS = (os.name == "nt")
 SENTINEL = object()
+JSON_ENCODER = "auto"
 USERAGENT = "gallery-dl/" + version.__version__
 EXECUTABLE = getattr(sys, "frozen", False)
 SPECIAL_EXTRACTORS = {"oauth", "recursive", "test"}
@@ -766,6 +858,82 @@ def chain_predicates(predicates, url, kwdict):
     return True
 
 
+class LRUCache(collections.OrderedDict):
+    """Dict evicting its least recently used entries beyond 'maxsize'
+
+    A 'maxsize' of 0 or None allows an unlimited number of entries.
+    The class attribute serves as default for all instances.
+    """
+    maxsize = 1024
+
+    def __init__(self, name="", maxsize=None):
+        collections.OrderedDict.__init__(self)
+        self.name = name
+        if maxsize is not None:
+            self.maxsize = maxsize
+        self.lock = threading.RLock()
+        self.hits = self.misses = self.evictions = self.expired = 0
+        LRU_CACHES.add(self)
+
+    def __getitem__(self, key):
+        with self.lock:
+            try:
+                value = collections.OrderedDict.__getitem__(self, key)
+            except KeyError:
+                self.misses += 1
+                raise
+            self.hits += 1
+            self.move_to_end(key)
+            return value
+
+    def __setitem__(self, key, value):
+        with self.lock:
+            collections.OrderedDict.__setitem__(self, key, value)
+            self.move_to_end(key)
+            maxsize = self.maxsize
+            if maxsize and len(self) > maxsize:
+                self.popitem(False)
+                self.evictions += 1
+
+    def __hash__(self):
+        return id(self)
+
+    def expire(self, func):
+        """Remove all entries for whose value 'func' returns True"""
+        with self.lock:
+            keys = [
+                key
+                for key, value in collections.OrderedDict.items(self)
+                if func(value)
+            ]
+            for key in keys:
+                del self[key]
+            self.expired += len(keys)
+
+    def stats(self):
+        """Return a dict with entry count and usage counters"""
+        return {
+            "entries"  : len(self),
+            "maxsize"  : self.maxsize,
+            "hits"     : self.hits,
+            "misses"   : self.misses,
+            "evictions": self.evictions,
+            "expired"  : self.expired,
+        }
+
+
+def log_cache_stats(log):
+    """Log usage counters of all in-memory caches"""
+    for lru in sorted(LRU_CACHES, key=lambda c: c.name):
+        if lru.hits or lru.misses:
+            log.debug("Cache '%s': %s entries, %s hits, %s misses, "
+                      "%s evictions, %s expired", lru.name, len(lru),
+                      lru.hits, lru.misses, lru.evictions, lru.expired)
+
+
+LRU_CACHES = weakref.WeakSet()
+
+
 class RangePredicate():
     """Predicate; True if the current index is in the given range(s)"""
 
@@ -877,9 +1045,11 @@ class ExtendedUrl():
 
 
 class DownloadArchive():
+    pending = ()
+    entries = None
 
     def __init__(self, path, format_string, pragma=None,
-                 cache_key="_archive_key"):
+                 cache_key="_archive_key", batch=0, interval=30.0):
         try:
             con = sqlite3.connect(path, timeout=60, check_same_thread=False)
         except sqlite3.OperationalError:
@@ -889,10 +1059,20 @@ class DownloadArchive():
 
         from . import formatter
         self.keygen = formatter.parse(format_string).format_map
-        self.close = con.close
+        self.connection = con
         self.cursor = cursor = con.cursor()
         self._cache_key = cache_key
 
+        # buffer new entries and write them in a single transaction
+        # once there are 'batch' of them or 'interval' seconds passed
+        self.batch = batch
+        self.interval = 30.0 if interval is None else interval
+        self.pending = set()
+        self.timestamp = time.monotonic()
+        self.results = {}
+
+        if batch:
+            cursor.execute("PRAGMA journal_mode=WAL")
         if pragma:
             for stmt in pragma:
                 cursor.execute("PRAGMA " + stmt)
@@ -905,15 +1085,258 @@ class DownloadArchive():
             cursor.execute("CREATE TABLE IF NOT EXISTS archive "
                            "(entry TEXT PRIMARY KEY)")
 
+    def __del__(self):
+        if self.pending:
+            try:
+                self.flush()
+            except Exception:
+                pass
+
     def check(self, kwdict):
         """Return True if the item described by 'kwdict' exists in archive"""
         key = kwdict[self._cache_key] = self.keygen(kwdict)
+        if key in self.pending:
+            return True
+        if self.entries is not None and key.startswith(self.prefix):
+            return key in self.entries
+        result = self.results.pop(key, None)
+        if result is not None:
+            return result
         self.cursor.execute(
             "SELECT 1 FROM archive WHERE entry=? LIMIT 1", (key,))
         return self.cursor.fetchone()
 
+    def check_many(self, kwdicts):
+        """Check multiple items at once
+
+        Returns a list of booleans, one for each item in 'kwdicts'.
+        These results get reused by subsequent calls to check().
+        """
+        keys = []
+        query = []
+        found = set()
+        entries = self.entries
+
+        for kwdict in kwdicts:
+            key = kwdict[self._cache_key] = self.keygen(kwdict)
+            keys.append(key)
+            if key in self.pending:
+                found.add(key)
+            elif entries is not None and key.startswith(self.prefix):
+                if key in entries:
+                    found.add(key)
+            else:
+                query.append(key)
+
+        cursor = self.cursor
+        # stay below SQLite's default limit of 999 host parameters
+        for index in range(0, len(query), 500):
+            chunk = query[index:index+500]
+            cursor.execute(
+                "SELECT entry FROM archive WHERE entry IN (" +
+                ",".join("?" * len(chunk)) + ")", chunk)
+            found.update(row[0] for row in cursor)
+
+        results = [key in found for key in keys]
+        self.results = dict(zip(keys, results))
+        return results
+
     def add(self, kwdict):
         """Add item described by 'kwdict' to archive"""
         key = kwdict.get(self._cache_key) or self.keygen(kwdict)
-        self.cursor.execute(
-            "INSERT OR IGNORE INTO archive (entry) VALUES (?)", (key,))
+        self.results.pop(key, None)
+        if self.entries is not None:
+            self.entries.add(key)
+        if self.batch:
+            self.pending.add(key)
+            if len(self.pending) >= self.batch or \
+                    time.monotonic() - self.timestamp >= self.interval:
+                self.flush()
+        else:
+            self.cursor.execute(
+                "INSERT OR IGNORE INTO archive (entry) VALUES (?)", (key,))
+
+    def preload(self, prefix="", limit=128):
+        """Load all entries starting with 'prefix' into memory
+
+        Returns the number of loaded entries, or None when their estimated
+        size exceeds 'limit' MiB, in which case database lookups are used.
+        """
+        cursor = self.cursor
+        if prefix:
+            cursor.execute(
+                "SELECT entry FROM archive WHERE entry >= ? AND entry < ?",
+                (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)))
+        else:
+            cursor.execute("SELECT entry FROM archive")
+
+        entries = set()
+        add = entries.add
+        size = 0
+        limit *= 1048576
+        getsizeof = sys.getsizeof
+
+        for entry, in cursor:
+            # string object plus hash table slot overhead
+            size += getsizeof(entry) + 40
+            if size > limit:
+                cursor.execute("SELECT 1")
+                self.entries = None
+                return None
+            add(entry)
+
+        self.prefix = prefix
+        self.entries = entries
+        return len(entries)
+
+    def flush(self):
+        """Write all buffered entries to archive"""
+        pending = self.pending
+        if pending:
+            cursor = self.cursor
+            cursor.execute("BEGIN IMMEDIATE")
+            try:
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO archive (entry) VALUES (?)",
+                    [(key,) for key in pending])
+            except BaseException:
+                cursor.execute("ROLLBACK")
+                raise
+            cursor.execute("COMMIT")
+            pending.clear()
+        self.timestamp = time.monotonic()
+
+    def close(self):
+        """Write buffered entries and close the database connection"""
+        try:
+            self.flush()
+        finally:
+            self.connection.close()
+
+
+def archive_stats(path, prefixes):
+    """Return a list of (prefix, count) tuples for a download archive
+
+    Entries starting with more than one of 'prefixes'
+    are counted for the longest one; entries not starting
+    with any of them are counted for an empty prefix.
+    """
+    con = _archive_connect(path)
+    try:
+        cursor = con.cursor()
+        counts = {}
+        for prefix in sorted(set(filter(None, prefixes)), reverse=True):
+            cursor.execute(
+                "SELECT count(*) FROM archive WHERE entry >= ? AND entry < ?",
+                (prefix, prefix[:-1] + chr(ord(prefix[-1]) + 1)))
+            count = cursor.fetchone()[0]
+            # remove entries already counted for longer prefixes
+            for other, num in counts.items():
+                if other.startswith(prefix):
+                    count -= num
+            counts[prefix] = count
+
+        cursor.execute("SELECT count(*) FROM archive")
+        counts[""] = cursor.fetchone()[0] - sum(counts.values())
+    finally:
+        con.close()
+
+    return sorted(
+        ((prefix, count) for prefix, count in counts.items() if count),
+        key=lambda x: (-x[1], x[0]),
+    )
+
+
+def archive_export(path, fp):
+    """Write all entries of a download archive to 'fp', one per line"""
+    con = _archive_connect(path)
+    try:
+        count = 0
+        write = fp.write
+        for entry, in con.execute("SELECT entry FROM archive"):
+            write(entry)
+            write("\n")
+            count += 1
+    finally:
+        con.close()
+    return count
+
+
+def archive_import(path, fp):
+    """Add all lines of 'fp' as entries to a download archive"""
+    archive = DownloadArchive(path, "")
+    try:
+        return _archive_insert(archive.cursor, (
+            "INSERT OR IGNORE INTO archive (entry) VALUES (?)",
+            ((line.rstrip("\n"),) for line in fp if line != "\n"),
+        ))
+    finally:
+        archive.close()
+
+
+def archive_merge(path, sources):
+    """Add the entries of all download archives in 'sources' to 'path'"""
+    archive = DownloadArchive(path, "")
+    cursor = archive.cursor
+    count = 0
+    try:
+        for source in sources:
+            _archive_connect(source).close()
+            cursor.execute("ATTACH DATABASE ? AS source", (source,))
+            try:
+                count += _archive_insert(cursor, (
+                    "INSERT OR IGNORE INTO archive (entry) "
+                    "SELECT entry FROM source.archive",
+                ))
+            finally:
+                cursor.execute("DETACH DATABASE source")
+    finally:
+        archive.close()
+    return count
+
+
+def archive_vacuum(path):
+    """Rebuild a download archive to reduce its size
+
+    Returns its file size before and after.
+    """
+    size = os.stat(path).st_size
+    con = _archive_connect(path)
+    try:
+        con.isolation_level = None
+        con.execute("VACUUM")
+    finally:
+        con.close()
+    return size, os.stat(path).st_size
+
+
+def _archive_connect(path):
+    """Open an existing download archive"""
+    if not os.path.isfile(path):
+        raise FileNotFoundError("No such file: '{}'".format(path))
+    con = sqlite3.connect(path, timeout=60)
+    try:
+        con.execute("SELECT entry FROM archive LIMIT 1")
+    except sqlite3.DatabaseError:
+        con.close()
+        raise
+    return con
+
+
+def _archive_insert(cursor, args):
+    """Run an INSERT statement in a single transaction
+
+    Returns the number of added entries.
+    """
+    cursor.execute("BEGIN IMMEDIATE")
+    try:
+        if len(args) > 1:
+            cursor.executemany(*args)
+        else:
+            cursor.execute(*args)
+    except BaseException:
+        cursor.execute("ROLLBACK")
+        raise
+    count = cursor.rowcount
+    cursor.execute("COMMIT")
+    return count
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+
+"""Compare the speed of regular and compiled format strings"""
+
+import sys
+import timeit
+import datetime
+
+import util  # noqa F401
+from gallery_dl import formatter
+
+FORMAT_STRINGS = (
+    "{category}",
+    "{id}_{num:>02}.{extension}",
+    "{user[name]}",
+    "{date:%Y-%m-%d} {title[:80]!t}",
+    "{id}_{title:?/ /R /_/}{num:?_//}.{extension}",
+    "{tags:J, /L64/too many tags/}",
+    "{artist|user[name]|author!l}",
+)
+
+KWDICT = {
+    "category" : "test",
+    "id"       : 123456789,
+    "num"      : 3,
+    "extension": "jpg",
+    "user"     : {"id": 98765, "name": "Name"},
+    "date"     : datetime.datetime(2010, 1, 1),
+    "title"    : " A title for this post ",
+    "tags"     : ["foo", "bar", "baz"],
+}
+
+
+def main(number=200000):
+    print("{:<48} {:>10} {:>10} {:>7}".format(
+        "format string", "default", "compiled", "speedup"))
+
+    for format_string in FORMAT_STRINGS:
+        fmt_default = formatter.StringFormatter(format_string).format_map
+        fmt_compiled = formatter.CompiledFormatter(format_string).format_map
+
+        if fmt_default(KWDICT) != fmt_compiled(KWDICT):
+            sys.exit("Different results for '{}'".format(format_string))
+
+        time_default = timeit.timeit(
+            lambda: fmt_default(KWDICT), number=number)
+        time_compiled = timeit.timeit(
+            lambda: fmt_compiled(KWDICT), number=number)
+
+        print("{:<48} {:>9.3f}s {:>9.3f}s {:>6.2f}x".format(
+            format_string, time_default, time_compiled,
+            time_default / time_compiled))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200000)
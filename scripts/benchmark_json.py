@@ -0,0 +1,94 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+
+"""Compare the speed of JSON encoders on metadata dictionaries
+
+Usage: benchmark_json.py [FILE] [NUMBER]
+
+FILE can be the output of 'gallery-dl -j' or 'gallery-dl --json-lines'.
+"""
+
+import sys
+import json
+import timeit
+import datetime
+
+import util  # noqa F401
+from gallery_dl import util as gdl_util
+
+FORMATS = (
+    ("indent=2, ascii"   , {"indent": 2, "sort_keys": True}),
+    ("indent=2"          , {"indent": 2, "ensure_ascii": False}),
+    ("json lines"        , {"separators": (",", ":"),
+                            "ensure_ascii": False}),
+    ("json lines, ascii" , {"separators": (",", ":")}),
+)
+
+KWDICT = {
+    "category"   : "twitter",
+    "subcategory": "timeline",
+    "tweet_id"   : 1234567890123456789,
+    "date"       : datetime.datetime(2010, 1, 1, 12, 0, 0),
+    "content"    : "A tweet with some text, #hashtags and ユニコード 😀",
+    "hashtags"   : ["hashtags", "test"],
+    "user"       : {
+        "id"         : 98765432,
+        "name"       : "username",
+        "nick"       : "Nick Name",
+        "description": "Some description " * 10,
+        "date"       : datetime.datetime(2008, 6, 1),
+        "followers_count": 12345,
+        "verified"   : False,
+    },
+    "author"     : {"id": 98765432, "name": "username"},
+    "width"      : 1920,
+    "height"     : 1080,
+    "num"        : 1,
+    "count"      : 4,
+    "filename"   : "AbCdEfGhIjKlMnOp",
+    "extension"  : "jpg",
+}
+
+
+def load(path):
+    """Return all metadata dicts from a '-j' or '--json-lines' file"""
+    with open(path, encoding="utf-8") as fp:
+        content = fp.read()
+    try:
+        messages = json.loads(content)
+    except ValueError:
+        messages = [json.loads(line) for line in content.splitlines()]
+    return [msg[-1] for msg in messages if isinstance(msg[-1], dict)]
+
+
+def main(kwdicts, number):
+    print("{} metadata dict(s)\n".format(len(kwdicts)))
+    print("{:<20} {:>10} {:>10} {:>7}".format(
+        "format", "json", "auto", "speedup"))
+
+    for name, kwargs in FORMATS:
+        gdl_util.JSON_ENCODER = "json"
+        enc_json = gdl_util.json_encoder(**kwargs)
+        gdl_util.JSON_ENCODER = "auto"
+        enc_auto = gdl_util.json_encoder(**kwargs)
+
+        time_json = timeit.timeit(
+            lambda: [enc_json(kwd) for kwd in kwdicts], number=number)
+        time_auto = timeit.timeit(
+            lambda: [enc_auto(kwd) for kwd in kwdicts], number=number)
+
+        print("{:<20} {:>9.3f}s {:>9.3f}s {:>6.2f}x".format(
+            name, time_json, time_auto, time_json / time_auto))
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    if args and not args[0].isdecimal():
+        kwdicts = load(args.pop(0))
+    else:
+        kwdicts = [KWDICT]
+    main(kwdicts, int(args[0]) if args else 20000)
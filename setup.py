@@ -108,6 +108,12 @@ def build_setuptools():
             "video": [
                 "youtube-dl",
             ],
+            "http2": [
+                "httpx[http2]",
+            ],
+            "json": [
+                "orjson",
+            ],
         },
         entry_points={
             "console_scripts": [
@@ -12,7 +12,13 @@ import sys
 import unittest
 from unittest.mock import patch
 
+import re
+import time
+import pickle
+import fnmatch
 import tempfile
+import threading
+import socketserver
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from gallery_dl import config, util  # noqa E402
@@ -221,6 +227,286 @@ class TestCache(unittest.TestCase):
         self.assertEqual(db.cache[1][0], 3)
         self.assertEqual(db.cache[2][0], 6)
 
+    def test_lru_mem(self):
+        @cache.memcache(keyarg=0)
+        def lru(a, b):
+            return a+b
+        lru.cache.maxsize = 2
+
+        self.assertEqual(lru(1, 1), 2)
+        self.assertEqual(lru(2, 2), 4)
+        self.assertEqual(lru(1, 0), 2)
+        self.assertEqual(lru(3, 3), 6)
+        self.assertEqual(list(lru.cache), [1, 3])
+        self.assertEqual(lru.cache.evictions, 1)
+
+        # evicted entry gets recomputed
+        self.assertEqual(lru(2, 0), 2)
+        self.assertEqual(list(lru.cache), [3, 2])
+
+    def test_sweep_mem(self):
+        @cache.memcache(maxage=2, keyarg=0)
+        def sw(a, b):
+            return a+b
+
+        with patch("time.time") as tmock:
+            tmock.return_value = 0.001
+            self.assertEqual(sw(1, 1), 2)
+            self.assertEqual(sw(2, 2), 4)
+            self.assertEqual(len(sw.cache), 2)
+
+            # expired entries get removed on the next insert
+            tmock.return_value += 2.0
+            self.assertEqual(sw(3, 3), 6)
+            self.assertEqual(list(sw.cache), [3])
+            self.assertEqual(sw.cache.expired, 2)
+
+    def test_database_wal(self):
+        mode = cache.DatabaseCacheDecorator.backend.db.execute(
+            "PRAGMA journal_mode").fetchone()[0]
+        self.assertEqual(mode, "wal")
+
+    def test_database_expire(self):
+        @cache.cache(keyarg=0, maxage=10)
+        def exp(a, b):
+            return a+b
+
+        with patch("time.time") as tmock:
+            tmock.return_value = 0.001
+            self.assertEqual(exp(1, 1), 2)
+            self.assertEqual(exp(2, 2), 4)
+
+            tmock.return_value += 20.0
+            self.assertEqual(exp(3, 3), 6)
+            info = cache.info()
+            self.assertGreaterEqual(info["expired"], 2)
+            self.assertEqual(info["path"], dbpath)
+            self.assertGreater(info["size"], 0)
+
+            self.assertGreaterEqual(cache.expire(), 2)
+            info = cache.info()
+            self.assertEqual(info["expired"], 0)
+            self.assertGreaterEqual(info["entries"], 1)
+
+            # expired values are gone from the database
+            exp.cache.clear()
+            self.assertEqual(exp(1, 0), 1)
+            self.assertEqual(exp(3, 0), 6)
+
+    def test_database_no_lock(self):
+        import sqlite3
+        other = sqlite3.connect(dbpath, timeout=0)
+
+        @cache.cache(keyarg=0, maxage=10)
+        def login(a):
+            # another process can write while a value gets computed
+            with other:
+                other.execute(
+                    "INSERT OR REPLACE INTO data VALUES ('other', '', 0)")
+            return a
+
+        try:
+            self.assertEqual(login(1), 1)
+        finally:
+            other.close()
+
+    def test_database_expire_locked(self):
+        import sqlite3
+        other = sqlite3.connect(dbpath)
+        try:
+            other.execute("BEGIN IMMEDIATE")
+            start = time.time()
+            self.assertEqual(cache.expire(), 0)
+            self.assertLess(time.time() - start, 10)
+        finally:
+            other.rollback()
+            other.close()
+
+
+class TestRedisBackend(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.server = RedisServer(("127.0.0.1", 0), RedisHandler)
+        cls.server.data = {}
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.url = "redis://127.0.0.1:{}/2".format(cls.server.server_address[1])
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.server.data.clear()
+        self._backend = cache.DatabaseCacheDecorator.backend
+        self.backend = cache.DatabaseCacheDecorator.backend = \
+            cache.RedisBackend(self.url, "secret")
+
+    def tearDown(self):
+        self.backend.close()
+        cache.DatabaseCacheDecorator.backend = self._backend
+
+    def test_shared(self):
+        calls = []
+
+        def func(a, b):
+            calls.append(a)
+            return a+b
+
+        # two decorators for the same function simulate separate workers
+        worker1 = cache.DatabaseCacheDecorator(func, 0, 10)
+        worker2 = cache.DatabaseCacheDecorator(func, 0, 10)
+
+        self.assertEqual(worker1(1, 2), 3)
+        self.assertEqual(worker2(1, 5), 3)
+        self.assertEqual(worker2(2, 2), 4)
+        self.assertEqual(worker1(2, 5), 4)
+        self.assertEqual(calls, [1, 2])
+
+        key = "gallery-dl:{}.func-1".format(__name__)
+        self.assertIn(key, self.server.data)
+        self.assertGreater(self.server.expires[key], time.time())
+        self.assertEqual(self.server.database, b"2")
+
+    def test_update_invalidate(self):
+        @cache.cache(keyarg=0, maxage=10)
+        def upd(a, b):
+            return a+b
+
+        self.assertEqual(upd(1, 1), 2)
+        upd.update(1, 5)
+        upd.cache.clear()
+        self.assertEqual(upd(1, 1), 5)
+
+        upd.invalidate(1)
+        self.assertEqual(upd(1, 2), 3)
+
+    def test_clear_info(self):
+        self.backend.set("gallery_dl.extractor.foo.func-a", 1, 2**32)
+        self.backend.set("gallery_dl.extractor.foo.func-b", 2, 2**32)
+        self.backend.set("gallery_dl.extractor.bar.func-a", 3, 2**32)
+
+        info = cache.info()
+        self.assertEqual(info["entries"], 3)
+        self.assertGreater(info["size"], 0)
+
+        self.assertEqual(cache.clear("foo"), 2)
+        self.assertEqual(cache.info()["entries"], 1)
+        self.assertEqual(cache.clear("ALL"), 1)
+        self.assertEqual(cache.info()["entries"], 0)
+
+    def test_signature(self):
+        self.backend.set("foo.func-a", [1, 2], 2**32)
+        self.assertEqual(self.backend.get("foo.func-a", 0), ([1, 2], 2**32))
+
+        other = cache.RedisBackend(self.url, "other")
+        try:
+            with self.assertLogs("cache", "WARNING"):
+                self.assertIsNone(other.get("foo.func-a", 0))
+        finally:
+            other.close()
+
+        data = self.server.data["gallery-dl:foo.func-a"]
+        self.server.data["gallery-dl:foo.func-b"] = data
+        with self.assertLogs("cache", "WARNING"):
+            self.assertIsNone(self.backend.get("foo.func-b", 0))
+
+        self.server.data["gallery-dl:foo.func-a"] = \
+            data[:32] + pickle.dumps((3, 2**32))
+        with self.assertLogs("cache", "WARNING"):
+            self.assertIsNone(self.backend.get("foo.func-a", 0))
+
+    def test_secret(self):
+        with self.assertRaises(ValueError):
+            cache.RedisBackend(self.url)
+
+        backend = cache.RedisBackend("redis://:pass@127.0.0.1:1")
+        self.assertEqual(backend.secret, b"pass")
+        backend = cache.RedisBackend("redis://:pass@127.0.0.1:1", "key")
+        self.assertEqual(backend.secret, b"key")
+
+    def test_unavailable(self):
+        backend = cache.DatabaseCacheDecorator.backend = \
+            cache.RedisBackend("redis://:pass@127.0.0.1:1")
+
+        @cache.cache(keyarg=0, maxage=10)
+        def na(a, b):
+            return a+b
+
+        with self.assertLogs("cache", "WARNING"):
+            self.assertEqual(na(1, 1), 2)
+        self.assertIsNone(backend.socket)
+        self.assertGreater(backend.retry, time.time())
+
+
+class RedisServer(socketserver.ThreadingMixIn, socketserver.TCPServer):
+    daemon_threads = True
+    database = None
+    expires = {}
+
+
+class RedisHandler(socketserver.StreamRequestHandler):
+    """Minimal stand-in for a Redis server"""
+
+    def handle(self):
+        while True:
+            line = self.rfile.readline()
+            if not line:
+                return
+            args = self.read_args(int(line[1:]))
+            self.wfile.write(self.command(args[0].upper(), args[1:]))
+
+    def read_args(self, num):
+        args = []
+        for _ in range(num):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+    def command(self, cmd, args):
+        data = self.server.data
+
+        if cmd == b"SELECT":
+            self.server.database = args[0]
+            return b"+OK\r\n"
+        if cmd == b"GET":
+            return self.bulk(data.get(args[0].decode()))
+        if cmd == b"SET":
+            key = args[0].decode()
+            opts = [arg.upper() for arg in args[2:]]
+            if b"NX" in opts and key in data:
+                return b"$-1\r\n"
+            data[key] = args[1]
+            if b"EX" in opts:
+                self.server.expires[key] = \
+                    time.time() + int(opts[opts.index(b"EX") + 1])
+            return b"+OK\r\n"
+        if cmd == b"DEL":
+            num = 0
+            for key in args:
+                if data.pop(key.decode(), None) is not None:
+                    num += 1
+            return ":{}\r\n".format(num).encode()
+        if cmd == b"STRLEN":
+            return ":{}\r\n".format(len(data.get(args[0].decode(), b"")))\
+                .encode()
+        if cmd == b"SCAN":
+            pattern = re.sub(r"\\(.)", r"[\1]", args[args.index(b"MATCH") + 1]
+                             .decode())
+            keys = [key for key in data if fnmatch.fnmatchcase(key, pattern)]
+            reply = [b"*2\r\n", self.bulk(b"0"),
+                     "*{}\r\n".format(len(keys)).encode()]
+            reply.extend(self.bulk(key.encode()) for key in keys)
+            return b"".join(reply)
+        return b"-ERR unknown command\r\n"
+
+    @staticmethod
+    def bulk(value):
+        if value is None:
+            return b"$-1\r\n"
+        return "${}\r\n".format(len(value)).encode() + value + b"\r\n"
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -95,6 +95,55 @@ class TestConfig(unittest.TestCase):
         test(("Z1", "Z2", "A1", "A2", "A3"), 999, 8)
         test((), 9)
 
+    def test_view(self):
+        for path in ((), ("b",), ("b", "b"), ("a", "a"), ("e", "f")):
+            view = config.view(path)
+            for key in "acdg":
+                self.assertEqual(view.get(key, 4),
+                                 config.interpolate(path, key, 4))
+            self.assertIs(config.view(path), view)
+
+        # modifying the configuration invalidates all views
+        config.set(("b", "b"), "d", 5)
+        self.assertEqual(config.view(("b", "b")).get("d"), 5)
+        config.unset(("b", "b"), "d")
+        self.assertEqual(config.view(("b", "b")).get("d"), None)
+
+        with config.apply(((("b",), "c", "foo"), ((), "a", 6))):
+            self.assertEqual(config.view(("b",))["c"], "foo")
+            self.assertEqual(config.view(("b", "b"))["a"], 6)
+        self.assertEqual(config.view(("b",))["c"], "text")
+        self.assertEqual(config.view(("b", "b"))["a"], 1)
+
+        config.clear()
+        self.assertEqual(config.view(("b", "b")), {})
+
+    def test_view_common(self):
+        paths = (("A1", "A2"), ("B1",), ("C1", "C2", "C3"))
+
+        def test(path, value, expected=None):
+            config.set(path, "KEY", value)
+            self.assertEqual(
+                config.view_common(("Z1", "Z2"), paths).get("KEY"),
+                config.interpolate_common(("Z1", "Z2"), paths, "KEY"))
+            self.assertEqual(
+                config.view_common(("Z1", "Z2"), paths).get("KEY"),
+                expected or value)
+
+        self.assertEqual(
+            config.view_common(("Z1", "Z2"), paths).get("KEY"), None)
+        test(("Z1",), 1)
+        test(("Z1", "Z2"), 2)
+        test(("Z1", "Z2", "C1"), 3)
+        test(("Z1", "Z2", "C1", "C2"), 4)
+        test(("Z1", "Z2", "C1", "C2", "C3"), 5)
+        test(("Z1", "Z2", "B1"), 6)
+        test(("Z1", "Z2", "A1"), 7)
+        test(("Z1", "Z2", "A1", "A2"), 8)
+        test(("Z1", "A1", "A2"), 999, 8)
+        test(("Z1", "Z2", "A1", "A2", "A3"), 999, 8)
+        test((), 9)
+
     def test_accumulate(self):
         self.assertEqual(config.accumulate((), "l"), [])
 
@@ -187,6 +187,7 @@ class TestHTTPDownloader(TestDownloaderBase):
 
     def tearDown(self):
         self.downloader.minsize = self.downloader.maxsize = None
+        self.downloader.segments = 0
 
     def test_http_download(self):
         self._run_test("jpg", None, DATA["jpg"], "jpg", "jpg")
@@ -224,6 +225,78 @@ class TestHTTPDownloader(TestDownloaderBase):
             success = self.downloader.download(url, pathfmt)
         self.assertFalse(success)
 
+    def test_http_segments(self):
+        self.downloader.segments = 4
+        self.downloader.segments_min = 100
+        self._run_test("jpg", None, DATA["jpg"], "jpg", "jpg")
+        self._run_test("png", None, DATA["png"], "jpg", "png")
+
+        pathfmt = self.job.pathfmt
+        self.assertFalse(os.path.exists(pathfmt.temppath + ".segments"))
+
+    def test_http_segments_resume(self):
+        self.downloader.segments = 4
+        self.downloader.segments_min = 100
+        data = DATA["jpg"]
+        size = len(data)
+
+        # preallocated .part file with 2 unfinished segments
+        pathfmt = self._prepare_destination(None, extension="jpg")
+        path = pathfmt.realpath + ".part"
+        with open(path, "wb") as fp:
+            fp.write(data[:50] + bytes(50) + data[100:150] + bytes(size-150))
+        with open(path + ".segments", "w") as fp:
+            fp.write('{{"size": {}, "segments": [[50, 100], [150, {}]]}}'
+                     .format(size, size))
+
+        with self.assertLogs(self.downloader.log, "DEBUG") as cm:
+            success = self.downloader.download(self.address + "/jpg", pathfmt)
+        self.assertTrue(success)
+        self.assertIn("Resuming segmented download", cm.output[0])
+        with open(path, "rb") as fp:
+            self.assertEqual(fp.read(), data)
+        self.assertFalse(os.path.exists(path + ".segments"))
+
+    def test_http_segments_disabled(self):
+        data = DATA["jpg"]
+        size = len(data)
+
+        # preallocated .part file of an unfinished segmented download
+        pathfmt = self._prepare_destination(None, extension="jpg")
+        path = pathfmt.realpath + ".part"
+        with open(path, "wb") as fp:
+            fp.write(data[:50] + bytes(size-50))
+        with open(path + ".segments", "w") as fp:
+            fp.write('{{"size": {}, "segments": [[50, {}]]}}'
+                     .format(size, size))
+
+        self.downloader.segments = 0
+        success = self.downloader.download(self.address + "/jpg", pathfmt)
+        self.assertTrue(success)
+        with open(path, "rb") as fp:
+            self.assertEqual(fp.read(), data)
+        self.assertFalse(os.path.exists(path + ".segments"))
+
+    def test_http_segments_state_first(self):
+        self.downloader.segments = 4
+        self.downloader.segments_min = 100
+        pathfmt = self._prepare_destination(None, extension="jpg")
+        path = pathfmt.realpath + ".part"
+
+        sizes = []
+        segments_store = self.downloader._segments_store
+
+        def store(path_state, size, segments):
+            sizes.append(os.stat(path).st_size)
+            segments_store(path_state, size, segments)
+
+        with patch.object(self.downloader, "_segments_store", store):
+            self.assertTrue(self.downloader.download(
+                self.address + "/jpg", pathfmt))
+
+        # segment state exists before the file gets preallocated
+        self.assertEqual(sizes[0], 0)
+
 
 class TestTextDownloader(TestDownloaderBase):
 
@@ -252,17 +325,19 @@ class HttpRequestHandler(http.server.BaseHTTPRequestHandler):
             self.wfile.write(self.path.encode())
             return
 
-        headers = {"Content-Length": len(output)}
+        headers = {"Content-Length": len(output), "Accept-Ranges": "bytes"}
 
         if "Range" in self.headers:
             status = 206
 
-            match = re.match(r"bytes=(\d+)-", self.headers["Range"])
+            match = re.match(r"bytes=(\d+)-(\d*)", self.headers["Range"])
             start = int(match.group(1))
+            end = int(match.group(2) or len(output)-1)
 
             headers["Content-Range"] = "bytes {}-{}/{}".format(
-                start, len(output)-1, len(output))
-            output = output[start:]
+                start, end, len(output))
+            output = output[start:end+1]
+            headers["Content-Length"] = len(output)
         else:
             status = 200
 
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+
+"""Tests for extractors based on AsyncExtractor (Python 3.6+)"""
+
+import os
+import sys
+import unittest
+
+import time
+import threading
+import socketserver
+import http.server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from gallery_dl import extractor, config  # noqa E402
+from gallery_dl.extractor.common import Message  # noqa E402
+from gallery_dl.extractor.asynchronous import AsyncExtractor  # noqa E402
+
+
+class Server(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    daemon_threads = True
+
+
+class AsyncTestCase(unittest.TestCase):
+    """Run a local HTTP server counting simultaneous requests"""
+    active = peak = 0
+
+    @classmethod
+    def setUpClass(cls):
+        lock = threading.Lock()
+
+        class Handler(http.server.BaseHTTPRequestHandler):
+
+            def do_GET(self):
+                with lock:
+                    cls.active += 1
+                    cls.peak = max(cls.peak, cls.active)
+                time.sleep(0.1)
+                with lock:
+                    cls.active -= 1
+
+                body = cls.body(self.path).encode()
+                self.send_response(200)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        cls.server = server = Server(("127.0.0.1", 0), Handler)
+        cls.root = "http://127.0.0.1:{}".format(server.server_port)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+
+    def setUp(self):
+        self.__class__.peak = 0
+
+    def tearDown(self):
+        config.clear()
+
+
+class TestAsyncExtractor(AsyncTestCase):
+
+    @staticmethod
+    def body(path):
+        return '{{"id": "{}"}}'.format(path[1:])
+
+    def _extractor(self):
+        root = self.root
+
+        class DetailsExtractor(AsyncExtractor):
+            category = "fake"
+            subcategory = "async"
+            pattern = "fake:async"
+
+            async def items(self):
+                yield Message.Directory, {}
+                async for post in self.map(self.details, "abcdef"):
+                    if post["id"] == "x":
+                        raise ValueError()
+                    yield Message.Url, "text:" + post["id"], post
+
+            async def details(self, post_id):
+                return await self.request_json_async(root + "/" + post_id)
+
+        return DetailsExtractor.from_url("fake:async")
+
+    def test_concurrent(self):
+        extr = self._extractor()
+        messages = list(extr)
+
+        self.assertEqual(messages[0], (Message.Directory, {}))
+        self.assertEqual(
+            [msg[1] for msg in messages[1:]],
+            ["text:a", "text:b", "text:c", "text:d", "text:e", "text:f"])
+        # 6 requests with 4 at a time
+        self.assertEqual(self.peak, 4)
+
+    def test_sequential(self):
+        config.set(("extractor",), "request-concurrency", 1)
+        extr = self._extractor()
+
+        self.assertEqual(len(list(extr)), 7)
+        self.assertEqual(self.peak, 1)
+
+    def test_close(self):
+        extr = self._extractor()
+        messages = iter(extr)
+        next(messages)
+        next(messages)
+        messages.close()
+        self.assertTrue(extr._loop.is_closed())
+        # let already started requests finish
+        extr._executor.shutdown()
+
+    def test_synchronous_items(self):
+        root = self.root
+
+        class SyncExtractor(AsyncExtractor):
+            category = "fake"
+            subcategory = "sync"
+            pattern = "fake:sync"
+
+            def items(self):
+                yield Message.Url, "text:", self.request(root + "/a").json()
+
+        extr = SyncExtractor.from_url("fake:sync")
+        self.assertEqual(list(extr), [(Message.Url, "text:", {"id": "a"})])
+
+
+class TestKemonopartyComments(AsyncTestCase):
+
+    @staticmethod
+    def body(path):
+        if path.startswith("/api/"):
+            return """[{}]""".format(",".join(
+                """{{"id": "{}", "service": "fanbox", "user": "1",
+                    "published": "Sat, 01 Jan 2022 00:00:00 GMT",
+                    "file": null, "attachments": [], "content": ""}}"""
+                .format(num) for num in range(1, 6)))
+        return """
+            <article id="{0}">
+              <a href="#{0}">user {0}</a>
+              <section class="comment__body">comment</section>
+              <time datetime="2022-01-01">
+            </article>""".format(path.rpartition("/")[2])
+
+    def _posts(self):
+        extr = extractor.find("https://kemono.party/fanbox/user/1")
+        extr.root = self.root
+        extr.api_url = self.root + "/api/fanbox/user/1"
+        return [msg[1] for msg in extr if msg[0] == Message.Directory]
+
+    def test_comments(self):
+        config.set(("extractor",), "comments", True)
+        posts = self._posts()
+
+        self.assertEqual([post["id"] for post in posts],
+                         ["1", "2", "3", "4", "5"])
+        self.assertEqual(posts[2]["comments"], [{
+            "id"  : "3",
+            "user": "user 3",
+            "body": "comment",
+            "date": "2022-01-01",
+        }])
+        # 5 comment pages with 4 at a time
+        self.assertEqual(self.peak, 4)
+
+    def test_no_comments(self):
+        posts = self._posts()
+        self.assertEqual(len(posts), 5)
+        self.assertNotIn("comments", posts[0])
+        self.assertEqual(self.peak, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
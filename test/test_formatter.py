@@ -455,5 +455,25 @@ def noarg():
         self.assertEqual(output, result, format_string)
 
 
+class TestFormatterCompiled(TestFormatter):
+
+    def setUp(self):
+        formatter._COMPILE = True
+        formatter._CACHE.clear()
+
+    def tearDown(self):
+        formatter._COMPILE = False
+        formatter._CACHE.clear()
+
+    def test_compiled(self):
+        fmt = formatter.parse("{a!l:R /_/}-{d[a]:?</>/}{n}.{title3:L1/x/}")
+        self.assertIsInstance(fmt, formatter.CompiledFormatter)
+        self.assertEqual(
+            fmt.format_map(self.kwdict), "hello_world-<foo>None.x")
+
+        fmt = formatter.parse("{t!d}")
+        self.assertIsInstance(fmt.format_map(self.kwdict), datetime.datetime)
+
+
 if __name__ == '__main__':
     unittest.main()
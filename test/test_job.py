@@ -9,14 +9,18 @@
 
 import os
 import sys
+import time
+import tempfile
 import unittest
-from unittest.mock import patch
+import threading
+from unittest.mock import patch, Mock
 
 import io
 import contextlib
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from gallery_dl import job, config, text  # noqa E402
+import gallery_dl  # noqa E402
+from gallery_dl import job, config, text, util, exception  # noqa E402
 from gallery_dl.extractor.common import Extractor, Message  # noqa E402
 
 
@@ -61,6 +65,384 @@ class TestDownloadJob(TestJob):
         self.assertEqual(func(TestExtractorParent), False)
         self.assertEqual(func(TestExtractorAlt)   , False)
 
+    def test_downloads_concurrent(self):
+        def download(url, pathfmt):
+            # let later files finish first
+            time.sleep((4 - int(url[-5])) * 0.05)
+            with pathfmt.open() as fp:
+                fp.write(url.encode())
+            return True
+
+        downloader = Mock()
+        downloader.download = download
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config.set((), "base-directory", tmpdir)
+            config.set((), "downloads-concurrent", 3)
+
+            tjob = self.jobclass(TestExtractor.from_url("test:"))
+            tjob.out = out = Mock()
+            with patch.object(tjob, "get_downloader",
+                              return_value=downloader):
+                self.assertEqual(tjob.run(), 0)
+
+            directory = os.path.join(tmpdir, "test_category", "")
+            paths = [directory + "test_{}.jpg".format(i) for i in (1, 2, 3)]
+            self.assertEqual(
+                [call[0][0] for call in out.success.call_args_list], paths)
+            for path in paths:
+                with open(path) as fp:
+                    self.assertTrue(fp.read().endswith(path[-5:]))
+
+    def test_downloads_concurrent_same_target(self):
+        def download(url, pathfmt):
+            time.sleep(0.05)
+            with pathfmt.open() as fp:
+                fp.write(url.encode())
+            return True
+
+        downloader = Mock()
+        downloader.download = Mock(side_effect=download)
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config.set((), "base-directory", tmpdir)
+            config.set((), "downloads-concurrent", 3)
+            config.set((), "filename", "same.{extension}")
+
+            tjob = self.jobclass(TestExtractor.from_url("test:"))
+            tjob.out = out = Mock()
+            with patch.object(tjob, "get_downloader",
+                              return_value=downloader):
+                self.assertEqual(tjob.run(), 0)
+
+            # later files get skipped instead of sharing the same target
+            path = os.path.join(tmpdir, "test_category", "same.jpg")
+            self.assertEqual(downloader.download.call_count, 1)
+            out.success.assert_called_once_with(path)
+            self.assertEqual(out.skip.call_count, 2)
+            with open(path) as fp:
+                self.assertEqual(fp.read(), "https://example.org/1.jpg")
+
+    def test_downloads_concurrent_interrupt(self):
+        release = threading.Event()
+        finished = []
+
+        def download(url, pathfmt):
+            release.wait(5)
+            finished.append(url)
+            return True
+
+        downloader = Mock()
+        downloader.download.side_effect = download
+
+        def items(extr):
+            yield Message.Directory, {}
+            for num in (1, 2):
+                url = "https://example.org/{}.jpg".format(num)
+                yield Message.Url, url, text.nameext_from_url(url)
+            raise KeyboardInterrupt()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config.set((), "base-directory", tmpdir)
+            config.set((), "downloads-concurrent", 2)
+
+            tjob = self.jobclass(TestExtractor.from_url("test:"))
+            tjob.out = Mock()
+            with patch.object(tjob, "get_downloader",
+                              return_value=downloader), \
+                    patch.object(TestExtractor, "items", items), \
+                    self.assertRaises(KeyboardInterrupt):
+                tjob.run()
+
+            # returned without waiting for running downloads
+            self.assertEqual(finished, [])
+            release.set()
+            tjob.executor.shutdown()
+
+        self.assertEqual(downloader.download.call_count, 2)
+        tjob.out.success.assert_not_called()
+
+    def test_downloads_concurrent_same_archive_key(self):
+        def download(url, pathfmt):
+            time.sleep(0.05)
+            return True
+
+        downloader = Mock()
+        downloader.download.side_effect = download
+
+        def items(extr):
+            yield Message.Directory, {}
+            for name in ("a", "b"):
+                url = "https://example.org/{}.jpg".format(name)
+                yield Message.Url, url, text.nameext_from_url(url, {"num": 1})
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config.set((), "base-directory", tmpdir)
+            config.set((), "downloads-concurrent", 3)
+            config.set((), "archive", os.path.join(tmpdir, "archive.db"))
+            config.set((), "archive-format", "{num}")
+
+            tjob = self.jobclass(TestExtractor.from_url("test:"))
+            tjob.out = out = Mock()
+            with patch.object(tjob, "get_downloader",
+                              return_value=downloader), \
+                    patch.object(TestExtractor, "items", items):
+                self.assertEqual(tjob.run(), 0)
+
+        # the second item waits for the first one and gets skipped
+        self.assertEqual(downloader.download.call_count, 1)
+        self.assertEqual(out.skip.call_count, 1)
+
+    def test_archive_precheck(self):
+        downloader = Mock()
+        downloader.download.return_value = True
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive_path = os.path.join(tmpdir, "archive.sqlite3")
+            archive = util.DownloadArchive(archive_path, "{num}")
+            archive.add({"num": "test_category2"})
+            archive.close()
+
+            config.set((), "base-directory", tmpdir)
+            config.set((), "archive", archive_path)
+            config.set((), "archive-format", "{num}")
+            config.set((), "archive-precheck", 2)
+
+            tjob = self.jobclass(TestExtractor.from_url("test:"))
+            tjob.out = Mock()
+            check_many = util.DownloadArchive.check_many
+            with patch.object(tjob, "get_downloader",
+                              return_value=downloader), \
+                    patch.object(util.DownloadArchive, "check_many",
+                                 autospec=True,
+                                 side_effect=check_many) as mock:
+                self.assertEqual(tjob.run(), 0)
+
+            self.assertEqual(
+                [len(call[0][1]) for call in mock.call_args_list], [2, 1])
+            self.assertEqual(
+                [call[0][0] for call in downloader.download.call_args_list],
+                ["https://example.org/1.jpg", "https://example.org/3.jpg"])
+
+    def test_archive_precheck_interrupt(self):
+        downloader = Mock()
+        downloader.download.return_value = True
+
+        def items(extr):
+            yield Message.Directory, {}
+            for num in (1, 2):
+                url = "https://example.org/{}.jpg".format(num)
+                yield Message.Url, url, text.nameext_from_url(url)
+            raise KeyboardInterrupt()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config.set((), "base-directory", tmpdir)
+            config.set((), "archive", os.path.join(tmpdir, "archive.db"))
+            config.set((), "archive-precheck", 5)
+
+            tjob = self.jobclass(TestExtractor.from_url("test:"))
+            tjob.out = Mock()
+            with patch.object(tjob, "get_downloader",
+                              return_value=downloader), \
+                    patch.object(TestExtractor, "items", items), \
+                    self.assertRaises(KeyboardInterrupt):
+                tjob.run()
+
+        # collected files do not get downloaded after Ctrl+C
+        downloader.download.assert_not_called()
+
+    def test_archive_preload_shared(self):
+        downloader = Mock()
+        downloader.download.return_value = True
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive_path = os.path.join(tmpdir, "archive.sqlite3")
+            archive = util.DownloadArchive(archive_path, "{num}")
+            archive.add({"num": "test_category2"})
+            archive.close()
+
+            config.set((), "base-directory", tmpdir)
+            config.set((), "archive", archive_path)
+            config.set((), "archive-format", "{num}")
+            config.set((), "archive-preload", True)
+
+            tjob = self.jobclass(TestExtractorParent.from_url("test:parent"))
+            tjob.out = Mock()
+            preload = util.DownloadArchive.preload
+            with patch.object(job.DownloadJob, "get_downloader",
+                              return_value=downloader), \
+                    patch("gallery_dl.output.select", return_value=Mock()), \
+                    patch.object(util.DownloadArchive, "preload",
+                                 autospec=True,
+                                 side_effect=preload) as mock:
+                self.assertEqual(tjob.run(), 0)
+
+            # child jobs reuse the entries loaded by their parent
+            self.assertEqual(mock.call_count, 1)
+            self.assertEqual(tjob.preloaded, {
+                (archive_path, "test_category"): {
+                    "test_category1", "test_category2", "test_category3"}})
+
+            # and see the entries added by their siblings
+            self.assertEqual(
+                [call[0][0] for call in downloader.download.call_args_list],
+                ["https://example.org/1.jpg", "https://example.org/3.jpg"])
+
+    def test_archive_stop(self):
+        downloader = Mock()
+        downloader.download.return_value = True
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            archive_path = os.path.join(tmpdir, "archive.sqlite3")
+            archive = util.DownloadArchive(archive_path, "{num}")
+            for num in (3, 4, 6, 7, 8):
+                archive.add({"num": "test_category" + str(num)})
+            archive.close()
+
+            config.set((), "base-directory", tmpdir)
+            config.set((), "archive", archive_path)
+            config.set((), "archive-format", "{num}")
+
+            def run(stop, queue=""):
+                config.set((), "archive-stop", stop)
+                extr = TestExtractorPages.from_url("test:pages" + queue)
+                tjob = self.jobclass(extr)
+                tjob.out = Mock()
+                with patch.object(tjob, "get_downloader",
+                                  return_value=downloader):
+                    self.assertEqual(tjob.run(), 0)
+                return extr.pages
+
+            # pages 2 and 4 are fully archived, but not consecutively
+            self.assertEqual(run(2), 4)
+            self.assertEqual(downloader.download.call_count, 3)
+
+            self.assertEqual(run(True), 1)
+            self.assertEqual(downloader.download.call_count, 3)
+
+            # queue URLs without new downloads count as archived files
+            downloader.reset_mock()
+            self.assertEqual(run(True, ":queue"), 1)
+            self.assertEqual(downloader.download.call_count, 0)
+
+    def test_listing_cache(self):
+        def download(url, pathfmt):
+            pathfmt.part_enable()
+            with pathfmt.open() as fp:
+                fp.write(url.encode())
+            return True
+
+        downloader = Mock()
+        downloader.download = download
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            directory = os.path.join(tmpdir, "test_category")
+            os.mkdir(directory)
+            for name in ("test_1.jpg", "test_2.jpg", "test_2.1.jpg"):
+                open(os.path.join(directory, name), "w").close()
+
+            config.set((), "base-directory", tmpdir)
+            config.set((), "listing-cache", True)
+            config.set((), "skip", "enumerate")
+
+            tjob = self.jobclass(TestExtractor.from_url("test:"))
+            tjob.out = Mock()
+            with patch.object(tjob, "get_downloader",
+                              return_value=downloader), \
+                    patch("os.listdir", side_effect=os.listdir) as listdir, \
+                    patch("os.path.exists") as exists:
+                self.assertEqual(tjob.run(), 0)
+
+            self.assertEqual(listdir.call_count, 1)
+            self.assertEqual(exists.call_count, 0)
+            self.assertEqual(sorted(os.listdir(directory)), [
+                "test_1.1.jpg", "test_1.jpg",
+                "test_2.1.jpg", "test_2.2.jpg", "test_2.jpg",
+                "test_3.jpg",
+            ])
+
+            # files added by finalize() are part of the cached listing
+            pathfmt = tjob.pathfmt
+            pathfmt.kwdict["extension"] = "jpg"
+            pathfmt.set_filename(pathfmt.kwdict)
+            pathfmt.build_path()
+            self.assertTrue(pathfmt._exists(pathfmt.realpath))
+
+    def test_directory_unchanged(self):
+        config.set((), "base-directory", "")
+        config.set((), "directory", ["{category}", "{user[name]}", "{tags}"])
+        pathfmt = job.path.PathFormat(TestExtractor.from_url("test:"))
+        kwdict = {"category": "test", "user": {"name": "Name"}, "tags": "a"}
+
+        with patch.object(pathfmt, "build_directory",
+                          wraps=pathfmt.build_directory) as build:
+            pathfmt.set_directory(kwdict)
+            pathfmt.set_directory(kwdict.copy())
+            self.assertEqual(build.call_count, 1)
+            self.assertEqual(
+                pathfmt.directory, os.path.join("test", "Name", "a", ""))
+
+            kwdict["user"] = {"name": "Foo"}
+            pathfmt.set_directory(kwdict)
+            pathfmt.set_directory(kwdict)
+            self.assertEqual(build.call_count, 2)
+            self.assertEqual(
+                pathfmt.directory, os.path.join("test", "Foo", "a", ""))
+
+            # mutable values get formatted every time
+            kwdict["tags"] = ["a", "b"]
+            pathfmt.set_directory(kwdict)
+            kwdict["tags"].append("c")
+            pathfmt.set_directory(kwdict)
+            self.assertEqual(build.call_count, 4)
+            self.assertEqual(pathfmt.directory, os.path.join(
+                "test", "Foo", "['a', 'b', 'c']", ""))
+
+    def test_prefetch(self):
+        downloader = Mock()
+        downloader.download.return_value = True
+
+        def run(extr):
+            tjob = self.jobclass(extr)
+            tjob.out = Mock()
+            with patch.object(tjob, "get_downloader",
+                              return_value=downloader):
+                return tjob.run()
+
+        with tempfile.TemporaryDirectory() as tmpdir:
+            config.set((), "base-directory", tmpdir)
+            config.set((), "prefetch", 2)
+
+            self.assertEqual(run(TestExtractorPages.from_url("test:pages")), 0)
+            self.assertEqual(
+                [call[0][0] for call in downloader.download.call_args_list],
+                ["https://example.org/{}.jpg".format(i) for i in range(1, 9)])
+
+            # exceptions get raised after all preceding messages
+            downloader.reset_mock()
+            extr = TestExtractorPages.from_url("test:pages")
+            extr.stop_pagination = Mock(side_effect=(
+                False, exception.StopExtraction("stop")))
+            with self.assertLogs(extr.log, "ERROR"):
+                self.assertEqual(run(extr), 1)
+            self.assertEqual(downloader.download.call_count, 4)
+
+            downloader.reset_mock()
+            extr = TestExtractorPages.from_url("test:pages")
+            extr.stop_pagination = Mock(
+                side_effect=exception.TerminateExtraction())
+            with self.assertRaises(exception.TerminateExtraction):
+                run(extr)
+            self.assertEqual(downloader.download.call_count, 2)
+
+            # as well as any other BaseException
+            downloader.reset_mock()
+            extr = TestExtractorPages.from_url("test:pages")
+            extr.stop_pagination = Mock(side_effect=SystemExit(2))
+            with self.assertRaises(SystemExit):
+                run(extr)
+            self.assertEqual(downloader.download.call_count, 2)
+
 
 class TestKeywordJob(TestJob):
     jobclass = job.KeywordJob
@@ -349,6 +731,152 @@ class TestDataJob(TestJob):
         self.assertEqual(tjob.data[-1][0], Message.Url)
         self.assertEqual(tjob.data[-1][2]["num"], "3")
 
+    def test_json_lines(self):
+        config.set(("output",), "json-lines", True)
+        config.set(("output",), "num-to-str", True)
+        config.set(("output",), "private", True)
+        extr = TestExtractor.from_url("test:")
+        tjob = self.jobclass(extr, file=io.StringIO(), ensure_ascii=False)
+
+        with patch.object(tjob.file, "flush") as flush:
+            tjob.run()
+        self.assertEqual(flush.call_count, 4)
+        self.assertEqual(tjob.data, [])
+
+        lines = tjob.file.getvalue().splitlines()
+        self.assertEqual(len(lines), 4)
+        self.assertEqual(
+            lines[0],
+            '[2,{"author":{"id":"123","name":"test"},'
+            '"category":"test_category","subcategory":"test_subcategory",'
+            '"user":{"id":"123","name":"test"}}]')
+
+        msg = util.json_loads(lines[3])
+        self.assertEqual(msg[:2], [Message.Url, "https://example.org/3.jpg"])
+        self.assertEqual(msg[2]["num"], "3")
+        self.assertEqual(msg[2]["tags"], ["foo", "bar", "テスト"])
+        self.assertEqual(
+            msg[2]["_fallback"], ["https://example.org/alt/3.jpg"])
+
+        # nested dicts still used by the extractor stay unchanged
+        self.assertEqual(extr.user, {"id": 123, "name": "test"})
+
+    def test_json_lines_exception(self):
+        config.set(("output",), "json-lines", True)
+        config.set(("output",), "num-to-str", True)
+        extr = TestExtractorException.from_url("test:exception")
+        tjob = self.jobclass(extr, file=io.StringIO())
+        tjob.run()
+        self.assertEqual(
+            tjob.file.getvalue().splitlines()[-1],
+            '["ZeroDivisionError","division by zero"]')
+
+
+class TestRunParallel(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        RecordJob.path = os.path.join(self.tmpdir.name, "events")
+        self.log = Mock()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+        config.clear()
+
+    def _run(self, urls, workers=2, per_category=1):
+        with patch("gallery_dl.extractor.find", find_category):
+            retval = gallery_dl.run_parallel(
+                RecordJob, urls, self.log, workers, per_category)
+        with open(RecordJob.path) as fp:
+            events = [line.split() for line in fp]
+        os.unlink(RecordJob.path)
+        return retval, events
+
+    @unittest.skipIf(not hasattr(os, "fork"), "no fork()")
+    def test_return_value(self):
+        retval, events = self._run(["a:1", "b:4", "unsupported"], 3)
+        self.assertEqual(retval, 1 | 4 | 64)
+        self.assertEqual(len(events), 4)
+        self.log.error.assert_called_once_with(
+            "Unsupported URL '%s'", "unsupported")
+
+    @unittest.skipIf(not hasattr(os, "fork"), "no fork()")
+    def test_per_category(self):
+        retval, events = self._run(["a:0", "a:0", "b:0"], 3)
+        self.assertEqual(retval, 0)
+
+        # the second 'a' job waits for the first one to finish,
+        # while the 'b' job runs alongside it
+        self.assertEqual(sorted(events[:2]), [
+            ["start", "a:0", "None"], ["start", "b:0", "None"]])
+        self.assertLess(events.index(["end", "a:0"]),
+                        events.index(["start", "a:0", "None"], 2))
+
+        retval, events = self._run(["a:0", "a:0"], 2, 2)
+        self.assertEqual(
+            [event[0] for event in events], ["start", "start", "end", "end"])
+
+    @unittest.skipIf(not hasattr(os, "fork"), "no fork()")
+    def test_barrier(self):
+        url = util.ExtendedUrl("b:0", [(("extractor",), "foo", "bar")], [])
+        retval, events = self._run(["a:0", "a:0", url, "c:0"], 3)
+        self.assertEqual(retval, 0)
+
+        # the waiting 'a' job gets started before applying global options
+        started = [event[1:] for event in events if event[0] == "start"]
+        self.assertEqual(sorted(started), [
+            ["a:0", "None"], ["a:0", "None"], ["b:0", "bar"], ["c:0", "bar"],
+        ])
+
+    def test_no_fork(self):
+        with patch("multiprocessing.get_all_start_methods",
+                   return_value=["spawn"]):
+            retval, events = self._run(["a:1", "a:2"])
+        self.assertEqual(retval, 1 | 2)
+        self.assertEqual(events, [
+            ["start", "a:1", "None"], ["end", "a:1"],
+            ["start", "a:2", "None"], ["end", "a:2"],
+        ])
+        self.log.warning.assert_called_once_with(
+            "Parallel jobs are not supported on this platform")
+
+    def test_process_cache_init(self):
+        from gallery_dl import cache
+        backend = Mock()
+
+        with patch.object(cache.DatabaseCacheDecorator, "backend", backend), \
+                patch.object(cache, "_init", return_value=False), \
+                patch.object(RecordJob, "run") as run, \
+                self.assertRaises(SystemExit) as cm:
+            gallery_dl._run_job_process(RecordJob, "a:0", self.log)
+
+        self.assertEqual(cm.exception.code, 1)
+        run.assert_not_called()
+
+
+class RecordJob():
+    """Write start and end of each run to a shared file"""
+    path = None
+
+    def __init__(self, url):
+        self.url = url
+
+    def run(self):
+        self._write("start", self.url, config.get(("extractor",), "foo"))
+        time.sleep(0.2)
+        self._write("end", self.url)
+        return int(self.url.partition(":")[2])
+
+    def _write(self, *args):
+        with open(self.path, "a") as fp:
+            fp.write(" ".join(map(str, args)) + "\n")
+
+
+def find_category(url):
+    category, _, value = url.partition(":")
+    if value:
+        return Mock(category=category)
+
 
 class TestExtractor(Extractor):
     category = "test_category"
@@ -399,6 +927,41 @@ class TestExtractorParent(Extractor):
             }
 
 
+class TestExtractorPages(Extractor):
+    category = "test_category"
+    subcategory = "test_subcategory_pages"
+    pattern = r"test:pages(:queue)?$"
+    pages = 0
+
+    def items(self):
+        queue = self.url.endswith(":queue")
+        yield Message.Directory, {}
+        for page in range(4):
+            self.pages += 1
+            for num in range(page*2 + 1, page*2 + 3):
+                if queue:
+                    yield Message.Queue, "test:child:" + str(num), {
+                        "_extractor": TestExtractorChild}
+                    continue
+                url = "https://example.org/{}.jpg".format(num)
+                yield Message.Url, url, text.nameext_from_url(
+                    url, {"num": num})
+            if self.stop_pagination():
+                return
+
+
+class TestExtractorChild(Extractor):
+    category = "test_category"
+    subcategory = "test_subcategory_child"
+    pattern = r"test:child:(\d+)$"
+
+    def items(self):
+        num = self.url.rpartition(":")[2]
+        url = "https://example.org/{}.jpg".format(num)
+        yield Message.Directory, {}
+        yield Message.Url, url, text.nameext_from_url(url, {"num": num})
+
+
 class TestExtractorException(Extractor):
     category = "test_category"
     subcategory = "test_subcategory_exception"
@@ -20,7 +20,7 @@ from datetime import datetime
 
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from gallery_dl import extractor, output, path  # noqa E402
-from gallery_dl import postprocessor, config  # noqa E402
+from gallery_dl import postprocessor, config, job  # noqa E402
 from gallery_dl.postprocessor.common import PostProcessor  # noqa E402
 
 
@@ -37,9 +37,8 @@ class FakeJob():
         self.get_logger = logging.getLogger
         self.hooks = collections.defaultdict(list)
 
-    def register_hooks(self, hooks, options):
-        for hook, callback in hooks.items():
-            self.hooks[hook].append(callback)
+    register_hooks = job.DownloadJob.register_hooks
+    _call_hook = staticmethod(job.DownloadJob._call_hook)
 
 
 class TestPostprocessorModule(unittest.TestCase):
@@ -461,6 +460,124 @@ class MetadataTest(BasePostprocessorTest):
 {"category": "test", "extension": "ext", "filename": "file"}
 """)
 
+    def test_metadata_jsonl_batch(self):
+        pp = self._create({"mode": "jsonl", "batch": 2, "sort": True})
+        self.assertEqual(pp.run, pp._run_batch)
+
+        with patch("builtins.open", mock_open()) as m:
+            self._trigger()
+            m.assert_not_called()
+            self._trigger()
+            m.assert_called_once_with(
+                self.pathfmt.realdirectory + "data.jsonl", "a",
+                encoding="utf-8")
+            self._trigger()
+            self._trigger(("finalize",))
+
+        self.assertEqual(m.call_count, 2)
+        self.assertEqual(self._output(m), (
+            '{"category":"test","extension":"ext","filename":"file"}\n'
+            '{"category":"test","extension":"ext","filename":"file"}\n'
+            '{"category":"test","extension":"ext","filename":"file"}\n'
+        ))
+
+    def test_metadata_sqlite(self):
+        import sqlite3
+        directory = os.path.join(self.dir.name, "sqlite")
+        archive = os.path.join(directory, "archive.sqlite3")
+        pp = self._create({
+            "mode"     : "sqlite",
+            "directory": directory,
+            "archive"  : archive,
+            "archive-format": "{filename}",
+        }, {"_private": 1})
+        self.assertEqual(pp.batch, 100)
+
+        for filename in ("a", "b", "a", "c"):
+            self.pathfmt.kwdict["filename"] = filename
+            self.pathfmt.set_filename(self.pathfmt.kwdict)
+            self.pathfmt.build_path()
+            self._trigger()
+
+        # nothing written before 'finalize'
+        path = os.path.join(directory, "metadata.sqlite3")
+        self.assertFalse(os.path.exists(path))
+        self._trigger(("finalize",))
+
+        with sqlite3.connect(path) as db:
+            rows = db.execute(
+                "SELECT id, path, data FROM metadata ORDER BY id").fetchall()
+        base = self.pathfmt.realdirectory
+        self.assertEqual(rows, [
+            (1, base + "a.ext",
+             '{"category":"test","filename":"a","extension":"ext"}'),
+            (2, base + "b.ext",
+             '{"category":"test","filename":"b","extension":"ext"}'),
+            (3, base + "a.ext",
+             '{"category":"test","filename":"a","extension":"ext"}'),
+            (4, base + "c.ext",
+             '{"category":"test","filename":"c","extension":"ext"}'),
+        ])
+
+        # files are in the archive after writing their metadata
+        pp.archive.flush()
+        self.pathfmt.kwdict["filename"] = "b"
+        self.assertTrue(pp.archive.check(self.pathfmt.kwdict))
+
+    def test_metadata_sqlite_events(self):
+        import sqlite3
+        directory = os.path.join(self.dir.name, "sqlite_events")
+        path = os.path.join(directory, "metadata.sqlite3")
+        self._create({
+            "mode"     : "sqlite",
+            "directory": directory,
+            "event"    : "post,finalize",
+            "filter"   : "filename != 'skip'",
+        })
+
+        # records with the same path do not replace each other
+        self.pathfmt.kwdict["id"] = 1
+        self._trigger(("post",))
+        self.pathfmt.kwdict["id"] = 2
+        self._trigger(("post",))
+
+        # and get written for a filtered "finalize" event as well
+        self.pathfmt.kwdict["filename"] = "skip"
+        self._trigger(("finalize",))
+
+        with sqlite3.connect(path) as db:
+            rows = db.execute(
+                "SELECT path, data FROM metadata ORDER BY id").fetchall()
+        self.assertEqual(len(rows), 2)
+        self.assertEqual(rows[0][0], rows[1][0])
+        self.assertIn('"id":1', rows[0][1])
+        self.assertIn('"id":2', rows[1][1])
+
+    def test_metadata_sqlite_batch_0(self):
+        import sqlite3
+        directory = os.path.join(self.dir.name, "sqlite0")
+        path = os.path.join(directory, "metadata.sqlite3")
+        pp = self._create({
+            "mode"     : "sqlite",
+            "directory": directory,
+            "batch"    : 0,
+        })
+        self.assertEqual(pp.run, pp._run_batch)
+        self.assertEqual(pp.batch, 1)
+
+        # each record gets written immediately
+        self._trigger()
+        with sqlite3.connect(path) as db:
+            self.assertEqual(
+                db.execute("SELECT COUNT(*) FROM metadata").fetchone()[0], 1)
+
+        pp = self._create({
+            "mode"     : "sqlite",
+            "directory": directory,
+            "batch"    : False,
+        })
+        self.assertEqual(pp.batch, 1)
+
     def test_metadata_modify(self):
         kwdict = {"foo": 0, "bar": {"bax": 1, "bay": 2, "baz": 3, "ba2": {}}}
         self._create({
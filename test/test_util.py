@@ -12,6 +12,7 @@ import sys
 import unittest
 
 import io
+import json
 import random
 import string
 import datetime
@@ -22,6 +23,11 @@ import http.cookiejar
 sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from gallery_dl import util, text, exception  # noqa E402
 
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
 
 class TestRange(unittest.TestCase):
 
@@ -301,6 +307,259 @@ class TestCookiesTxt(unittest.TestCase):
         )
 
 
+class TestJSONEncoder(unittest.TestCase):
+
+    OBJ = {
+        "int"  : 123,
+        "float": 2.5,
+        "str"  : "テスト \x01\x7f\"\\ 😀",
+        "list" : [1, "a", None, True, [], {}],
+        "dict" : {1: "one", "2": {"date": datetime.datetime(2010, 1, 1)}},
+        "date" : datetime.datetime(2010, 1, 1, 12, 30),
+        "none" : util.NONE,
+    }
+
+    def tearDown(self):
+        util.JSON_ENCODER = "auto"
+
+    def test_formats(self):
+        for encoder in ("auto", "json"):
+            util.JSON_ENCODER = encoder
+            for kwargs in (
+                {},
+                {"indent": 2},
+                {"indent": 4},
+                {"indent": 0},
+                {"indent": 4, "sort_keys": True, "ensure_ascii": False},
+                {"separators": (",", ":")},
+                {"separators": [",", ":"], "sort_keys": True},
+                {"indent": 2, "sort_keys": True, "ensure_ascii": False},
+                {"separators": (",", ":"), "ensure_ascii": False},
+            ):
+                obj = self.OBJ
+                if kwargs.get("sort_keys"):
+                    obj = obj.copy()
+                    del obj["dict"]
+                self.assertEqual(
+                    util.json_encoder(**kwargs)(obj),
+                    json.dumps(obj, default=str, **kwargs),
+                    (encoder, kwargs),
+                )
+
+    def test_fallback(self):
+        util.JSON_ENCODER = "json"
+        encode = util.json_encoder(separators=(",", ":"))
+        self.assertEqual(encode.__name__, "encode")
+
+        util.JSON_ENCODER = "auto"
+        encode = util.json_encoder(indent="\t")
+        self.assertEqual(encode.__name__, "encode")
+        encode = util.json_encoder(indent=4, separators=(", ", ": "))
+        self.assertEqual(encode.__name__, "encode")
+
+    @unittest.skipIf(not orjson, "orjson not installed")
+    def test_orjson(self):
+        encode = util.json_encoder(indent=4)
+        self.assertEqual(encode.__name__, "encode_fast")
+        self.assertEqual(
+            encode({"a": [1, {"b": " \n  c"}], "d": {}}),
+            '{\n    "a": [\n        1,\n        {\n            "b": '
+            '" \\n  c"\n        }\n    ],\n    "d": {}\n}')
+
+        encode = util.json_encoder(indent=2)
+        self.assertEqual(encode.__name__, "encode_fast")
+
+        # characters escaped only with 'ensure_ascii'
+        self.assertEqual(encode("\x7f"), '"\\u007f"')
+        self.assertEqual(encode("\x7fä"), '"\\u007f\\u00e4"')
+
+        # values unsupported by orjson
+        self.assertEqual(encode([2**64]), "[\n  18446744073709551616\n]")
+        self.assertEqual(encode(["\ud800"]), '[\n  "\\ud800"\n]')
+
+
+class TestLRUCache(unittest.TestCase):
+
+    def test_eviction(self):
+        lru = util.LRUCache("test", 3)
+        for i in range(5):
+            lru[i] = i
+        self.assertEqual(list(lru), [2, 3, 4])
+        self.assertEqual(lru.evictions, 2)
+
+        # access moves an entry to the end
+        self.assertEqual(lru[2], 2)
+        lru[5] = 5
+        self.assertEqual(list(lru), [4, 2, 5])
+
+    def test_unbounded(self):
+        lru = util.LRUCache("test", 0)
+        for i in range(5000):
+            lru[i] = i
+        self.assertEqual(len(lru), 5000)
+        self.assertEqual(lru.evictions, 0)
+
+    def test_stats(self):
+        lru = util.LRUCache("test", 2)
+        lru["a"] = 1
+        lru["a"]
+        with self.assertRaises(KeyError):
+            lru["b"]
+        lru.expire(lambda value: value == 1)
+
+        self.assertEqual(lru, {})
+        self.assertEqual(lru.stats(), {
+            "entries"  : 0,
+            "maxsize"  : 2,
+            "hits"     : 1,
+            "misses"   : 1,
+            "evictions": 0,
+            "expired"  : 1,
+        })
+        self.assertIn(lru, util.LRU_CACHES)
+
+
+class TestDownloadArchive(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "archive.sqlite3")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def _entries(self):
+        archive = util.DownloadArchive(self.path, "{id}")
+        archive.cursor.execute("SELECT entry FROM archive")
+        entries = {row[0] for row in archive.cursor}
+        archive.close()
+        return entries
+
+    def test_archive(self):
+        archive = util.DownloadArchive(self.path, "{category}_{id}")
+        kwdict = {"category": "test", "id": 1}
+
+        self.assertFalse(archive.check(kwdict))
+        self.assertEqual(kwdict["_archive_key"], "test_1")
+        archive.add(kwdict)
+        self.assertTrue(archive.check(kwdict))
+        self.assertEqual(self._entries(), {"test_1"})
+        archive.close()
+
+    def test_archive_batch(self):
+        archive = util.DownloadArchive(self.path, "{id}", batch=3)
+        archive.cursor.execute("PRAGMA journal_mode")
+        self.assertEqual(archive.cursor.fetchone()[0], "wal")
+
+        for i in range(1, 3):
+            archive.add({"id": i})
+            self.assertTrue(archive.check({"id": i}))
+        self.assertEqual(self._entries(), set())
+
+        archive.add({"id": 3})
+        self.assertEqual(archive.pending, set())
+        self.assertEqual(self._entries(), {"1", "2", "3"})
+
+        archive.add({"id": 4})
+        archive.close()
+        self.assertEqual(self._entries(), {"1", "2", "3", "4"})
+
+    def test_archive_batch_interval(self):
+        archive = util.DownloadArchive(
+            self.path, "{id}", batch=100, interval=0.0)
+        archive.add({"id": 1})
+        self.assertEqual(self._entries(), {"1"})
+
+        archive.interval = 3600.0
+        archive.add({"id": 2})
+        self.assertEqual(self._entries(), {"1"})
+        del archive
+        self.assertEqual(self._entries(), {"1", "2"})
+
+    def test_archive_preload(self):
+        archive = util.DownloadArchive(self.path, "{category}{id}")
+        for category, id in (("foo", 1), ("foo", 2), ("bar", 1)):
+            archive.add({"category": category, "id": id})
+
+        self.assertEqual(archive.preload("foo"), 2)
+        self.assertEqual(archive.entries, {"foo1", "foo2"})
+
+        # entries outside of 'prefix' still get checked in the database
+        archive.cursor.close()
+        self.assertTrue(archive.check({"category": "foo", "id": 1}))
+        self.assertFalse(archive.check({"category": "foo", "id": 3}))
+        with self.assertRaises(Exception):
+            archive.check({"category": "bar", "id": 1})
+        archive.close()
+
+        archive = util.DownloadArchive(self.path, "{category}{id}")
+        self.assertEqual(archive.preload(), 3)
+        archive.add({"category": "baz", "id": 1})
+        self.assertTrue(archive.check({"category": "baz", "id": 1}))
+
+        self.assertIsNone(archive.preload("", 0))
+        self.assertIsNone(archive.entries)
+        archive.close()
+
+    def test_archive_check_many(self):
+        archive = util.DownloadArchive(self.path, "{id}", batch=10)
+        for id in range(0, 2000, 2):
+            archive.add({"id": id})
+        archive.flush()
+        archive.add({"id": 3})
+
+        kwdicts = [{"id": id} for id in range(1200)]
+        results = archive.check_many(kwdicts)
+        self.assertEqual(results, [
+            id % 2 == 0 or id == 3 for id in range(1200)])
+        self.assertEqual(kwdicts[5]["_archive_key"], "5")
+
+        # reuse results without database access
+        archive.cursor.close()
+        self.assertTrue(archive.check({"id": 2}))
+        self.assertFalse(archive.check({"id": 1}))
+        with self.assertRaises(Exception):
+            archive.check({"id": 1})
+
+    def test_archive_tools(self):
+        archive = util.DownloadArchive(self.path, "{id}", batch=1000)
+        for id in ("foo1", "foo2", "foobar1", "bar1", "baz1"):
+            archive.add({"id": id})
+        archive.close()
+
+        self.assertEqual(
+            util.archive_stats(self.path, ("foo", "foobar", "bar", "qux")),
+            [("foo", 2), ("", 1), ("bar", 1), ("foobar", 1)])
+
+        with io.StringIO() as fp:
+            self.assertEqual(util.archive_export(self.path, fp), 5)
+            exported = fp.getvalue()
+        self.assertEqual(
+            sorted(exported.split()),
+            ["bar1", "baz1", "foo1", "foo2", "foobar1"])
+
+        path = os.path.join(self.tmpdir.name, "import.sqlite3")
+        with io.StringIO(exported + "\nqux1\n") as fp:
+            self.assertEqual(util.archive_import(path, fp), 6)
+        with io.StringIO("qux1\nqux2") as fp:
+            self.assertEqual(util.archive_import(path, fp), 1)
+
+        path_merge = os.path.join(self.tmpdir.name, "merge.sqlite3")
+        self.assertEqual(
+            util.archive_merge(path_merge, (self.path, path)), 7)
+        self.assertEqual(util.archive_merge(path_merge, (path,)), 0)
+        self.assertEqual(util.archive_stats(path_merge, ()), [("", 7)])
+
+        before, after = util.archive_vacuum(path_merge)
+        self.assertGreater(before, 0)
+        self.assertGreater(after, 0)
+
+        with self.assertRaises(FileNotFoundError):
+            util.archive_export(path + ".nonexistent", io.StringIO())
+        with self.assertRaises(FileNotFoundError):
+            util.archive_merge(path_merge, (path + ".nonexistent",))
+
+
 class TestOther(unittest.TestCase):
 
     def test_bencode(self):